@@ -20,7 +20,9 @@ def float_to_fixed(val, total_bits, int_bits):
         fixed_val = min_val
     return fixed_val & ((1 << total_bits) - 1)
 
-def generate_exp_lut(datawidth, int_part_input, filename="exp_lut.mem"):
+def generate_exp_lut(datawidth, int_part_input, filename="exp_lut.mem", fmt="bin"):
+    # fmt="bin" writes $readmemb lines, fmt="hex" writes $readmemh lines
+    # (out_datawidth bits zero-padded on the MSB side to whole hex digits)
     frac_part_input = datawidth - int_part_input
     int_part_output = 2 * int_part_input
     frac_part_output = 2 * frac_part_input
@@ -35,8 +37,9 @@ def generate_exp_lut(datawidth, int_part_input, filename="exp_lut.mem"):
 
             input_bin = format(i, f'0{datawidth}b')
             output_bin = format(exp_fixed, f'0{out_datawidth}b')
+            output_hex = format(exp_fixed, f'0{(out_datawidth + 3) // 4}x')
 
-            f.write(f"{output_bin}\n")
+            f.write(f"{output_hex if fmt == 'hex' else output_bin}\n")
 
     print(f"[+] Lookup table saved to '{filename}'.")
 
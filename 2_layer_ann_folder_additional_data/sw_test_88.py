@@ -1,5 +1,12 @@
-import numpy as np
 import os # Import os for checking file existence
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ann_sw.mem_cache import cached_load_mem_dataset
+from ann_sw.mem_decode import load_mem_params
+from ann_sw.inference import predict
+from ann_sw.model_bundle import ModelBundle
 
 # ---------- PARAMETERS ----------
 # These parameters MUST match the ones used during the training/export phase
@@ -19,134 +26,66 @@ n_w, x_w = 16, 8
 # Fixed-point format for biases (Q16.16 as per your request)
 n_b, x_b = 32, 16
 
-# ---------- Fixed-Point Helpers ----------
-def fixed_bin_to_float(bin_str, n, x):
-    """
-    Converts a 2's complement binary string to a floating-point value
-    based on the specified total bits (n) and integer bits (x).
-    """
-    if not bin_str:
-        return 0.0 # Handle empty string case gracefully
-
-    val = int(bin_str, 2) # Convert binary string to integer
-    
-    # Check if the number is negative (MSB is 1)
-    if bin_str[0] == '1':
-        val -= (1 << n) # Subtract 2^n to get the correct negative value
-    
-    # Divide by 2^(n-x) to get the floating-point value
-    # (n-x) is the number of fractional bits
-    return val / (2 ** (n - x))
-
-def relu(x):
-    """ReLU activation function."""
-    return np.maximum(0, x)
-
-def softmax(x):
-    """Softmax activation function for the output layer."""
-    # Subtracting np.max(x) for numerical stability to prevent overflow
-    # when computing exponentials of large numbers.
-    x = x - np.max(x)
-    exp_x = np.exp(x)
-    return exp_x / np.sum(exp_x)
+# File format of every .mem file read here: "bin" ($readmemb) or "hex" ($readmemh)
+mem_format = "bin"
+
+# Optional model bundle (python -m ann_sw.model_bundle pack ...). When set, all
+# layers, their Q-formats and dims come from this one file instead of the
+# layerN_weights.mem / layerN_biases.mem pairs.
+model_bundle = None  # e.g. "model.annb"
+
+# Samples per batched forward pass (None = whole test set at once)
+batch_size = None
 
 # ---------- LOAD WEIGHTS & BIASES ----------
 weights = []
 biases = []
 
 print("Loading weights and biases...")
-for layer_idx in range(1, len(dims)):
-    in_dim = dims[layer_idx - 1]
-    out_dim = dims[layer_idx]
-
-    weights_file = f"layer{layer_idx}_weights.mem"
-    biases_file = f"layer{layer_idx}_biases.mem"
-
-    if not os.path.exists(weights_file) or not os.path.exists(biases_file):
-        print(f"Error: Missing weight/bias files for layer {layer_idx}.")
-        print(f"Please ensure '{weights_file}' and '{biases_file}' exist and were generated by the training script with matching fixed-point formats.")
-        exit()
-
-    # Load weights (Q8.8, so each weight is n_w bits long)
-    with open(weights_file, 'r') as wf:
-        w_layer = []
-        for line in wf:
-            line = line.strip()
-            if not line: continue # Skip empty lines
-            # Each line represents a row (for one output neuron)
-            # Each row has in_dim weights, each n_w bits long
-            row = [fixed_bin_to_float(line[j*n_w:(j+1)*n_w], n_w, x_w) for j in range(in_dim)]
-            w_layer.append(np.array(row)) # Convert row to numpy array
-        weights.append(np.array(w_layer))  # shape: (out_dim, in_dim)
-    print(f"Loaded {weights_file} (expected {n_w}-bit values)")
-
-    # Load biases (Q16.16, so each bias is n_b bits long)
-    with open(biases_file, 'r') as bf:
-        b_layer = []
-        for line in bf:
-            line = line.strip()
-            if not line: continue # Skip empty lines
-            b_layer.append(fixed_bin_to_float(line, n_b, x_b))
-        biases.append(np.array(b_layer))  # shape: (out_dim,)
-    print(f"Loaded {biases_file} (expected {n_b}-bit values)")
+if model_bundle is not None:
+    model = ModelBundle(model_bundle)
+    dims = model.dims
+    for layer in model:
+        weights.append(layer.weights_float())  # shape: (out_dim, in_dim)
+        biases.append(layer.biases_float())    # shape: (out_dim,)
+    print(f"Loaded {len(model)} layers from {model_bundle}")
+else:
+    for layer_idx in range(1, len(dims)):
+        in_dim = dims[layer_idx - 1]
+
+        weights_file = f"layer{layer_idx}_weights.mem"
+        biases_file = f"layer{layer_idx}_biases.mem"
+
+        if not os.path.exists(weights_file) or not os.path.exists(biases_file):
+            print(f"Error: Missing weight/bias files for layer {layer_idx}.")
+            print(f"Please ensure '{weights_file}' and '{biases_file}' exist and were generated by the training script with matching fixed-point formats.")
+            exit()
+
+        # Load weights (Q8.8, so each weight is n_w bits long)
+        # Each line is one output neuron's row of in_dim weights
+        _, w_layer = load_mem_params(weights_file, n_w, x_w, num_fields=in_dim, fmt=mem_format)
+        weights.append(w_layer)  # shape: (out_dim, in_dim)
+        print(f"Loaded {weights_file} (expected {n_w}-bit values)")
+
+        # Load biases (Q16.16, so each bias is n_b bits long)
+        _, b_layer = load_mem_params(biases_file, n_b, x_b, num_fields=1, fmt=mem_format)
+        biases.append(b_layer[:, 0])  # shape: (out_dim,)
+        print(f"Loaded {biases_file} (expected {n_b}-bit values)")
 
 # ---------- LOAD TEST DATA ----------
-X_test = []
-y_test = []
-
 test_data_file = "test_88.mem"
 if not os.path.exists(test_data_file):
     print(f"Error: {test_data_file} not found. Please ensure it's in the same directory.")
     exit()
 
 print(f"\nLoading test data from {test_data_file}...")
-with open(test_data_file, "r") as f:
-    for line in f:
-        line = line.strip()
-        if not line: continue # Skip empty lines
-        
-        # Pixel data is 64 pixels * n_in_w bits
-        # Label is 4 bits
-        pixel_bits = line[:-4]
-        label_bits = line[-4:]
-
-        # Each pixel is n_in_w bits long (16 bits)
-        image = [fixed_bin_to_float(pixel_bits[i*n_in_w:(i+1)*n_in_w], n_in_w, x_in_w) for i in range(dims[0])]
-        label = int(label_bits, 2)
-
-        X_test.append(image)
-        y_test.append(label)
-
-X_test = np.array(X_test, dtype=np.float32)
-y_test = np.array(y_test, dtype=np.int32)
+# Pixel data is 64 pixels * n_in_w bits (16 bits each), label is 4 bits
+_, X_test, y_test = cached_load_mem_dataset(test_data_file, n_in_w, x_in_w, num_features=dims[0], label_bits=4, fmt=mem_format)
 print(f"Loaded {len(X_test)} test samples.")
 
 # ---------- INFERENCE ----------
+# The whole test set goes through each layer as one X @ W.T + b GEMM;
+# softmax is skipped because argmax(logits) == argmax(softmax(logits)).
 print("\nStarting inference...")
-correct = 0
-total = len(X_test)
-
-for idx in range(total):
-    x = X_test[idx] # Get current input image
-
-    # Forward pass through the network layers
-    for l in range(len(weights)):
-        # Matrix multiplication: current_input_vector . weights_matrix.T
-        # As loaded, weights[l] is (out_dim, in_dim) and x is (in_dim,)
-        x = np.dot(weights[l], x) + biases[l]
-        
-        # Apply activation function
-        if l < len(weights) - 1: # Apply ReLU for hidden layers
-            x = relu(x)
-        else: # Apply Softmax for the output layer
-            x = softmax(x)
-
-    # Get the predicted class (index with highest probability)
-    pred = np.argmax(x)
-    
-    # Check if prediction matches the true label
-    if pred == y_test[idx]:
-        correct += 1
-
-accuracy = correct / total * 100
+predictions, logits, accuracy = predict(X_test, weights, biases, y=y_test, batch_size=batch_size)
 print(f"\nTest Accuracy: {accuracy:.2f}%")
@@ -1,5 +1,11 @@
+import sys
+from pathlib import Path
+
 import numpy as np
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ann_sw.mem_index import MemSampleIndex
+
 # -------- Fixed-point Config --------
 IN_BITS = 16      # Q8.8
 MAC_BITS = 32     # Q16.16
@@ -75,8 +81,14 @@ def run_inference(bitstring):
     print_outputs("Final Output - ReLU Q8.8", out2, 16)
     print(f"\n[One-hot Prediction]: {pred.tolist()}")
 
-# -------- Bitstring Input (manually set here) --------
+# -------- Bitstring Input (manually set here, or sample #k of a .mem file) --------
+SAMPLE_FILE = "test_88.mem"
+SAMPLE_INDEX = None   # e.g. 17 to check line 17 of SAMPLE_FILE instead of the bitstring below
+
 bitstring = (
     "00000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000001011001000000001101011100000000111000110000000000011010000000000000000000000000000000000000000000000000000000000000000000000000001100010000000000011110000000000101110000000000100101000000000000000000000000000000000000000000000000000000000000000000000000000000110000000000111100110000000011101111000000000000101100000000000000000000000000000000000000000000000000000000000000110000000000000000000000000000000000000000000110100000000011000101000000001010100000000000000000000000000000000000000000001101011100000000000100100000000000000000000000000000000000000000010110010000000011111110000000000000000000000000000000000000000000000000000000001011011000000000110001110000000011000111000000000100001000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000011")
 
+if SAMPLE_INDEX is not None:
+    bitstring = MemSampleIndex(SAMPLE_FILE).line(SAMPLE_INDEX)
+
 run_inference(bitstring)
@@ -0,0 +1,14 @@
+"""
+Shared software-side helpers for the ANN hardware flow.
+
+Every folder in this repo carries its own copy of the fixed-point helpers and
+.mem readers/writers. The modules here hold the vectorized versions that the
+per-folder scripts import, so a change of datawidth or Q-format only has to be
+handled in one place.
+
+Scripts add the repository root to sys.path and import the submodule they
+need, e.g.
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from ann_sw.mem_encode import write_mem_dataset
+"""
@@ -0,0 +1,227 @@
+import json
+import sys
+
+import numpy as np
+
+from ann_sw.inference import ACTIVATIONS
+from ann_sw.mem_decode import load_mem_dataset
+from ann_sw.model_bundle import ModelBundle, default_activations
+
+# ---------- PARAMETERS ----------
+# Range calibration. The float model runs once over a calibration subset and
+# every tensor (input, per-layer weights, biases, pre-activation sums and
+# post-ReLU outputs) feeds a streaming RangeStats: min/max, an exact
+# histogram of the integer bits each value needs and a log2-magnitude
+# histogram for percentiles. Nothing is kept per sample, so the subset can
+# be as large as the training set.
+#
+# recommend() then picks, per tensor, the fewest integer bits x (sign
+# included) that leave at most CLIP_RATE of its values outside
+# [-2^(x-1), 2^(x-1)), keeps the tensor's current fractional bits and
+# returns the Q(n, x) formats as a config (save_config / load_config),
+# which the exporters and block_temp_inference/sw_test_88.py read. The
+# engine shares one activation format between layers, so the config's
+# activation format covers the widest layer: post-ReLU values on hidden
+# layers (negative sums become 0 whatever they saturate to) and the raw
+# sums on the output layer.
+CLIP_RATE = 1e-4
+CALIB_SAMPLES = 1000
+BATCH_ROWS = 4096
+MAX_INT_BITS = 64
+OCTAVE_BINS = 8          # magnitude histogram bins per power of two
+MAG_OCTAVES = (-40, 40)  # log2 |v| range of the magnitude histogram; outliers go to the end bins
+PERCENTILES = (50, 99, 99.9)
+
+def int_bits_needed(values):
+    """Integer bits, sign included, each value needs: the smallest x with -2^(x-1) <= v < 2^(x-1)."""
+    values = np.asarray(values, dtype=np.float64)
+    mantissa, exponent = np.frexp(values)
+    # v = m * 2^e with 0.5 <= |m| < 1; -2^k fits in k + 1 bits, +2^k needs k + 2
+    bits = exponent + 1 - ((values < 0) & (mantissa == -0.5))
+    return np.clip(bits, 1, MAX_INT_BITS)
+
+# ---------- STREAMING STATISTICS ----------
+class RangeStats:
+    """Streaming range statistics of one tensor, see the parameters above."""
+
+    def __init__(self):
+        self.count = 0
+        self.zeros = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.int_bits = np.zeros(MAX_INT_BITS + 1, dtype=np.int64)
+        lo, hi = MAG_OCTAVES
+        self.magnitude = np.zeros((hi - lo) * OCTAVE_BINS, dtype=np.int64)
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64).reshape(-1)
+        if values.size == 0:
+            return
+        self.count += values.size
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.int_bits += np.bincount(int_bits_needed(values), minlength=MAX_INT_BITS + 1)
+        nonzero = np.abs(values[values != 0])
+        self.zeros += values.size - nonzero.size
+        bins = np.floor((np.log2(nonzero) - MAG_OCTAVES[0]) * OCTAVE_BINS).astype(np.int64)
+        self.magnitude += np.bincount(np.clip(bins, 0, len(self.magnitude) - 1), minlength=len(self.magnitude))
+
+    def clip_fraction(self, x):
+        """Fraction of values that saturate with x integer bits."""
+        if self.count == 0:
+            return 0.0
+        return float(self.int_bits[x + 1:].sum()) / self.count
+
+    def recommend_int_bits(self, clip_rate=CLIP_RATE):
+        """Fewest integer bits (at least 1) that saturate at most clip_rate of the values."""
+        allowed = clip_rate * self.count
+        over = self.count - np.cumsum(self.int_bits)
+        return max(1, int(np.argmax(over <= allowed)))
+
+    def percentile(self, q):
+        """Upper bound of the q-th percentile of |value|, at the magnitude histogram's resolution."""
+        if self.count == 0:
+            return 0.0
+        rank = q / 100 * self.count - self.zeros
+        if rank <= 0:
+            return 0.0
+        b = min(int(np.searchsorted(np.cumsum(self.magnitude), rank)), len(self.magnitude) - 1)
+        return 2.0 ** (MAG_OCTAVES[0] + (b + 1) / OCTAVE_BINS)
+
+    def summary(self):
+        if self.count == 0:
+            return "no values"
+        pct = "  ".join(f"p{q:g} {self.percentile(q):.4g}" for q in PERCENTILES)
+        return (f"{self.count} values, min {self.min:.4g}, max {self.max:.4g}, "
+                f"{self.zeros / self.count * 100:.1f}% zero, |v| {pct}")
+
+# ---------- CALIBRATION PASS ----------
+def calibrate(X, weights, biases, activations=None, samples=CALIB_SAMPLES, batch_size=BATCH_ROWS, seed=0):
+    """
+    Runs the float model (as ann_sw.inference.forward) once over `samples`
+    randomly chosen rows of X (all rows when None) and returns an ordered
+    dict of RangeStats: 'input', then per layer 'layerN.weights',
+    'layerN.biases', 'layerN.pre' (sums before the activation) and, on
+    hidden layers, 'layerN.post'.
+    """
+    X = np.asarray(X)
+    if activations is None:
+        activations = default_activations(len(weights))
+    rows = np.arange(len(X))
+    if samples is not None and samples < len(X):
+        rows = np.sort(np.random.default_rng(seed).choice(len(X), samples, replace=False))
+
+    stats = {"input": RangeStats()}
+    weights = [np.asarray(w, dtype=np.float64) for w in weights]
+    biases = [np.asarray(b, dtype=np.float64).reshape(-1) for b in biases]
+    for l, (w, b) in enumerate(zip(weights, biases), start=1):
+        stats[f"layer{l}.weights"] = RangeStats()
+        stats[f"layer{l}.weights"].add(w)
+        stats[f"layer{l}.biases"] = RangeStats()
+        stats[f"layer{l}.biases"].add(b)
+        stats[f"layer{l}.pre"] = RangeStats()
+        if l < len(weights):
+            stats[f"layer{l}.post"] = RangeStats()
+
+    for start in range(0, len(rows), batch_size):
+        x = np.asarray(X[rows[start:start + batch_size]], dtype=np.float64)
+        stats["input"].add(x)
+        for l, (w, b) in enumerate(zip(weights, biases), start=1):
+            x = x @ w.T + b
+            stats[f"layer{l}.pre"].add(x)
+            if l < len(weights):
+                x = ACTIVATIONS[activations[l - 1]](x)
+                stats[f"layer{l}.post"].add(x)
+    return stats
+
+# ---------- RECOMMENDATION / CONFIG ----------
+def _fit(stats, fmt, clip_rate):
+    """(n, x) keeping fmt's fractional bits with the recommended integer bits."""
+    n, x = fmt
+    new_x = stats.recommend_int_bits(clip_rate)
+    return [n - x + new_x, new_x]
+
+def recommend(stats, in_format, w_formats, b_formats, a_format, clip_rate=CLIP_RATE):
+    """
+    Config dict of recommended formats. The current formats (scalars or one
+    (n, x) per layer for weights and biases) only contribute their
+    fractional bits; every tensor gets the integer bits its statistics need.
+    """
+    num_layers = sum(1 for key in stats if key.endswith(".weights"))
+    w_formats = list(w_formats) if isinstance(w_formats[0], (list, tuple)) else [w_formats] * num_layers
+    b_formats = list(b_formats) if isinstance(b_formats[0], (list, tuple)) else [b_formats] * num_layers
+    layers = []
+    for l in range(1, num_layers + 1):
+        out = stats[f"layer{l}.post"] if l < num_layers else stats[f"layer{l}.pre"]
+        layers.append({"weights": _fit(stats[f"layer{l}.weights"], w_formats[l - 1], clip_rate),
+                       "biases": _fit(stats[f"layer{l}.biases"], b_formats[l - 1], clip_rate),
+                       "activations": _fit(out, a_format, clip_rate)})
+    widest = max(layer["activations"][1] for layer in layers)
+    frac_a = a_format[0] - a_format[1]
+    return {"clip_rate": clip_rate,
+            "input": _fit(stats["input"], in_format, clip_rate),
+            "activations": [frac_a + widest, widest],
+            "layers": layers}
+
+def config_formats(config):
+    """(input, [weight (n, x) per layer], [bias (n, x) per layer], activation (n, x)) of a config."""
+    return (tuple(config["input"]), [tuple(layer["weights"]) for layer in config["layers"]],
+            [tuple(layer["biases"]) for layer in config["layers"]], tuple(config["activations"]))
+
+def save_config(config, filename):
+    with open(filename, "w") as f:
+        json.dump(config, f, indent=2)
+        f.write("\n")
+
+def load_config(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+def report(stats, config=None):
+    """Report lines: statistics per tensor and, with a config, its recommended format and clip rate."""
+    formats = {}
+    if config is not None:
+        formats["input"] = config["input"]
+        for l, layer in enumerate(config["layers"], start=1):
+            formats[f"layer{l}.weights"] = layer["weights"]
+            formats[f"layer{l}.biases"] = layer["biases"]
+            key = f"layer{l}.post" if f"layer{l}.post" in stats else f"layer{l}.pre"
+            formats[key] = layer["activations"]
+    lines = []
+    for key, s in stats.items():
+        line = f"{key:16s} {s.summary()}"
+        if key in formats:
+            n, x = formats[key]
+            line += f" -> Q({n},{x}), {s.clip_fraction(x) * 100:.3g}% clipped"
+        lines.append(line)
+    if config is not None:
+        n, x = config["activations"]
+        lines.append(f"shared activation format Q({n},{x})")
+    return lines
+
+# ---------- COMMAND LINE ----------
+# python -m ann_sw.calibration model.annb train_88.mem 32 16 [qformats.json] [--clip 1e-4] [--samples 1000]
+# Fractional bits are kept from the bundle's formats (activations: the input's).
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {}
+    for name in ("--clip", "--samples"):
+        if name in args:
+            i = args.index(name)
+            options[name] = args[i + 1]
+            del args[i:i + 2]
+    if len(args) not in (4, 5):
+        print("Usage: python -m ann_sw.calibration BUNDLE DATASET N_IN X_IN [CONFIG] [--clip RATE] [--samples N]")
+        sys.exit(1)
+    bundle = ModelBundle(args[0])
+    in_format = (int(args[2]), int(args[3]))
+    _, X, _ = load_mem_dataset(args[1], *in_format, num_features=bundle.dims[0])
+    stats = calibrate(X, [layer.weights_float() for layer in bundle], [layer.biases_float() for layer in bundle],
+                      [layer.activation for layer in bundle], samples=int(options.get("--samples", CALIB_SAMPLES)))
+    config = recommend(stats, in_format, [layer.w_format for layer in bundle], [layer.b_format for layer in bundle],
+                       in_format, clip_rate=float(options.get("--clip", CLIP_RATE)))
+    for line in report(stats, config):
+        print(line)
+    if len(args) == 5:
+        save_config(config, args[4])
+        print(f"Saved recommended formats to {args[4]}")
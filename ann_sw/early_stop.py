@@ -0,0 +1,169 @@
+import math
+import sys
+
+import numpy as np
+
+from ann_sw.mem_decode import load_mem_dataset
+from ann_sw.model_bundle import ModelBundle
+from ann_sw.parallel_eval import bundle_model
+
+# ---------- PARAMETERS ----------
+# Early-stopping evaluation. Samples are visited in a seeded random order,
+# BATCH_SIZE at a time, and after every batch the running accuracy gets a
+# confidence interval. A candidate stops as soon as
+#   - the interval is narrower than `width` (accuracy known well enough),
+#   - its upper bound is below `threshold` (provably not good enough), or
+#   - its upper bound is below `best`, e.g. the lower bound of the best
+#     candidate so far (provably not the winner),
+# or when the test set runs out. Accuracies, bounds, width and threshold
+# are percentages, like every accuracy printed in this repo.
+#
+# The interval is recomputed after every batch without a correction for
+# the repeated looks, so the effective confidence is somewhat below the
+# nominal one; raise CONFIDENCE when a strict guarantee matters.
+BATCH_SIZE = 250
+CONFIDENCE = 0.95
+METHOD = "wilson"           # or "clopper-pearson" (exact, more conservative)
+
+def _z(confidence):
+    """Two-sided standard normal quantile, by bisection on math.erf."""
+    lo, hi = 0.0, 10.0
+    for _ in range(100):
+        mid = (lo + hi) / 2
+        if math.erf(mid / math.sqrt(2)) < confidence:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+# ---------- CONFIDENCE INTERVALS ----------
+def wilson_interval(correct, total, confidence=CONFIDENCE):
+    """Wilson score interval (lo, hi) of a binomial proportion, as fractions."""
+    if total == 0:
+        return 0.0, 1.0
+    z = _z(confidence)
+    p = correct / total
+    denom = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denom
+    half = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+def _binom_cdf(k, n, p, log_comb):
+    """P(X <= k) for X ~ Binomial(n, p), summed in log space."""
+    if k < 0:
+        return 0.0
+    if k >= n:
+        return 1.0
+    i = np.arange(k + 1)
+    terms = log_comb[:k + 1] + i * math.log(p) + (n - i) * math.log1p(-p)
+    top = terms.max()
+    return float(math.exp(top) * np.exp(terms - top).sum())
+
+def clopper_pearson_interval(correct, total, confidence=CONFIDENCE):
+    """Exact Clopper-Pearson interval (lo, hi) as fractions, by bisection on the binomial CDF."""
+    if total == 0:
+        return 0.0, 1.0
+    alpha = 1 - confidence
+    log_fact = np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, total + 1)))])
+    log_comb = log_fact[total] - log_fact[:total + 1] - log_fact[total::-1]
+
+    def solve(k, target):
+        # P(X <= k) decreases in p; find the p where it equals target
+        lo, hi = 0.0, 1.0
+        for _ in range(60):
+            mid = (lo + hi) / 2
+            if _binom_cdf(k, total, mid, log_comb) > target:
+                lo = mid
+            else:
+                hi = mid
+        return (lo + hi) / 2
+
+    # lower: P(X >= correct) = alpha/2, upper: P(X <= correct) = alpha/2
+    lower = 0.0 if correct == 0 else solve(correct - 1, 1 - alpha / 2)
+    upper = 1.0 if correct == total else solve(correct, alpha / 2)
+    return lower, upper
+
+INTERVALS = {"wilson": wilson_interval, "clopper-pearson": clopper_pearson_interval}
+
+# ---------- EARLY-STOPPING EVALUATION ----------
+def estimate_accuracy(X, y, model, width=1.0, threshold=None, best=None, batch_size=BATCH_SIZE,
+                      confidence=CONFIDENCE, method=METHOD, seed=0):
+    """
+    Runs model (any callable mapping an (N, features) block to (N, classes)
+    scores, e.g. ann_sw.parallel_eval.float_model()) on random batches of
+    (X, y) until one of the stopping rules above holds.
+
+    Returns a dict: accuracy and interval (lo, hi) in percent, samples
+    consumed, correct, total available and the stop reason ('width',
+    'threshold', 'best' or 'exhausted').
+    """
+    X = np.asarray(X)
+    y = np.asarray(y)
+    interval_of = INTERVALS[method]
+    order = np.random.default_rng(seed).permutation(len(X))
+    correct = seen = 0
+    reason = "exhausted"
+    lo, hi = 0.0, 100.0
+    for start in range(0, len(order), batch_size):
+        rows = np.sort(order[start:start + batch_size])   # sorted: memmap reads stay sequential
+        predictions = np.argmax(model(X[rows]), axis=1)
+        correct += int(np.sum(predictions == y[rows]))
+        seen += len(rows)
+        lo, hi = (100 * v for v in interval_of(correct, seen, confidence))
+        if hi - lo <= width:
+            reason = "width"
+            break
+        if threshold is not None and hi < threshold:
+            reason = "threshold"
+            break
+        if best is not None and hi < best:
+            reason = "best"
+            break
+    accuracy = correct / seen * 100 if seen else None
+    return {"accuracy": accuracy, "interval": (lo, hi), "samples": seen, "correct": correct,
+            "total": len(X), "reason": reason}
+
+def race(X, y, models, width=1.0, threshold=None, **kwargs):
+    """
+    estimate_accuracy() for each candidate in turn, passing the best lower
+    bound so far as `best`, so clearly worse candidates stop after a few
+    batches. Every candidate sees the same sample order. Returns one result
+    per model plus the total samples consumed.
+    """
+    results = []
+    best = None
+    for model in models:
+        result = estimate_accuracy(X, y, model, width=width, threshold=threshold, best=best, **kwargs)
+        results.append(result)
+        if result["reason"] in ("width", "exhausted"):
+            best = result["interval"][0] if best is None else max(best, result["interval"][0])
+    return results, sum(r["samples"] for r in results)
+
+# ---------- COMMAND LINE ----------
+# python -m ann_sw.early_stop test_bin.txt 11 5 model_a.annb model_b.annb ... [--width 1.0] [--threshold 90]
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {}
+    for name in ("--width", "--threshold", "--confidence", "--method"):
+        if name in args:
+            i = args.index(name)
+            options[name] = args[i + 1]
+            del args[i:i + 2]
+    if len(args) < 4:
+        print("Usage: python -m ann_sw.early_stop DATASET N_IN X_IN BUNDLE [BUNDLE ...] "
+              "[--width PCT] [--threshold PCT] [--confidence C] [--method wilson|clopper-pearson]")
+        sys.exit(1)
+    filenames = args[3:]
+    features = ModelBundle(filenames[0]).dims[0]
+    _, X_test, y_test = load_mem_dataset(args[0], int(args[1]), int(args[2]), num_features=features)
+    threshold = float(options["--threshold"]) if "--threshold" in options else None
+    results, consumed = race(X_test, y_test, [bundle_model(f) for f in filenames],
+                             width=float(options.get("--width", 1.0)), threshold=threshold,
+                             confidence=float(options.get("--confidence", CONFIDENCE)),
+                             method=options.get("--method", METHOD))
+    for filename, r in zip(filenames, results):
+        lo, hi = r["interval"]
+        print(f"{r['accuracy']:6.2f}% [{lo:6.2f}, {hi:6.2f}]  {r['samples']:6d}/{r['total']} samples  "
+              f"stop: {r['reason']:9s}  {filename}")
+    full = len(X_test) * len(filenames)
+    print(f"{consumed} of {full} sample evaluations ({full / max(consumed, 1):.1f}x fewer than full runs)")
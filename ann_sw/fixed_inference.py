@@ -0,0 +1,443 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from ann_sw.fixed_point import saturate_raw, shift_right
+from ann_sw.mem_decode import load_mem_dataset, load_mem_params
+from ann_sw.model_bundle import storage_dtype
+from ann_sw.sparsity import SparsityStats, zero_skip_matmul
+
+# ---------- PARAMETERS ----------
+# Integer model of the datapath in block_temp_inference/sw_test_88.py:
+#   acc = sum(int64(a) * int64(w))            product scale 2^f_prod
+#   acc += b >> (f_b - f_prod)                bias aligned to the product scale
+#   a'  = sat(round(acc, f_prod -> F_A), N_A) rounding bias, arithmetic shift
+#   a'  = max(a', 0) on hidden layers
+# with F_A = N_A - X_A. Every step is done on whole (samples, neurons)
+# arrays; the results are bit-identical to the scalar loops.
+
+# Samples per integer matmul. Bounds the (rows, in_dim) int64 temporaries.
+BATCH_ROWS = 4096
+
+# Tap points a trace callback can see at every layer, in datapath order:
+#   acc        sum of products, before the bias is added
+#   shifted    after bias, rounding bias and arithmetic shift (not yet saturated)
+#   saturated  clamped to Q(N_A, X_A)
+#   relu       after ReLU (hidden layers only)
+TRACE_POINTS = ("acc", "shifted", "saturated", "relu")
+
+# Saturating accumulation (acc_bits set): block_booth.sv passes the partial
+# sum east through the columns of a row, adding one product per column and
+# clamping to the signed 2*datawidth + $clog2(columns) bit range (POS_SAT /
+# NEG_SAT) at every step. Column j holds fan-in input j. Limited to 62 bits
+# so a running sum plus one product cannot wrap in int64.
+MAX_ACC_BITS = 62
+
+# Narrow mode (narrow=True): weights and activations are kept in the smallest
+# of int8/16/32/64 that holds them, and every layer gets a static headroom
+# bound, sum|w| * 2^(N_A-1) + |b| over its worst neuron, which covers every
+# partial sum in any order. The products are summed in the first entry of
+# ACC_DTYPES that is exact for that many signed bits. NumPy's integer matmul
+# does not use BLAS, so int32 instead of int64 gains only a few percent,
+# while float32/float64 GEMMs are exact below 2^24/2^53 and an order of
+# magnitude faster. A bound beyond int64 (63 bits, leaving room for the
+# rounding bias) raises OverflowError instead of wrapping silently.
+ACC_DTYPES = ((np.float32, 25), (np.float64, 54), (np.int64, 63))
+
+def booth_acc_bits(datawidth, columns):
+    """Width of block_booth.sv's partial sum: 2*datawidth + $clog2(columns)."""
+    return 2 * datawidth + max(0, int(columns - 1).bit_length())
+
+def _per_layer(value, num_layers):
+    return list(value) if isinstance(value, (list, tuple)) else [value] * num_layers
+
+# ---------- ARRAY-WIDE REQUANTIZATION ----------
+def shift_round(values, shift):
+    """
+    value >> shift after adding the rounding bias 1 << (shift - 1), with
+    the bias subtracted for negative values; a negative shift is a plain
+    left shift. fixed_point.shift_right() with sign_bias rounding.
+    """
+    return shift_right(values, shift, "sign_bias")
+
+def saturate(values, n):
+    """Clamps to the n-bit two's complement range (fixed_point.saturate_raw())."""
+    return saturate_raw(values, n)
+
+def requantize(values, current_frac_bits, n, x):
+    """Rounds values with current_frac_bits to Q(n, x) and saturates, as the datapath does (int64)."""
+    return saturate(shift_round(values, current_frac_bits - (n - x)), n)
+
+def saturating_matmul(a, weights_t, acc_bits, stats=None, layer=0):
+    """
+    a @ weights_t with the running sum clamped to acc_bits after every
+    product, in fan-in (column) order. Vectorized over samples and output
+    neurons; only the fan-in dimension is a Python loop.
+
+    stats, a SaturationStats, records how often each neuron's running sum
+    saturated.
+    """
+    if acc_bits > MAX_ACC_BITS:
+        raise ValueError(f"acc_bits={acc_bits} exceeds {MAX_ACC_BITS}; use acc_bits=None for an unbounded accumulator")
+    pos_sat, neg_sat = (1 << (acc_bits - 1)) - 1, -(1 << (acc_bits - 1))
+    acc = np.zeros((a.shape[0], weights_t.shape[1]), dtype=np.int64)
+    steps = np.zeros(acc.shape, dtype=np.int64) if stats is not None else None
+    for j in range(weights_t.shape[0]):
+        acc += a[:, j:j + 1] * weights_t[j]
+        if stats is not None:
+            steps += (acc > pos_sat) | (acc < neg_sat)
+        np.clip(acc, neg_sat, pos_sat, out=acc)
+    if stats is not None:
+        stats.add(layer, steps)
+    return acc
+
+class SaturationStats:
+    """
+    Per-layer, per-neuron counts of saturating accumulation steps.
+
+    steps[l][k]   column steps where neuron k's running sum hit POS/NEG_SAT
+    samples[l][k] samples in which neuron k saturated at least once
+    """
+
+    def __init__(self):
+        self.steps = {}
+        self.samples = {}
+        self.rows = {}
+        self.fan_in = {}
+
+    def add(self, layer, steps):
+        if layer not in self.steps:
+            self.steps[layer] = np.zeros(steps.shape[1], dtype=np.int64)
+            self.samples[layer] = np.zeros(steps.shape[1], dtype=np.int64)
+            self.rows[layer] = 0
+        self.steps[layer] += steps.sum(axis=0)
+        self.samples[layer] += (steps > 0).sum(axis=0)
+        self.rows[layer] += steps.shape[0]
+
+    def summary(self):
+        """One line per layer, e.g. for printing after an evaluation run."""
+        lines = []
+        for layer in sorted(self.steps):
+            hit = self.samples[layer]
+            rows = max(self.rows[layer], 1)
+            lines.append(f"layer {layer + 1}: {int((hit > 0).sum())}/{len(hit)} neurons saturated; "
+                         f"{int(hit.sum())} of {self.rows[layer] * len(hit)} (sample, neuron) sums "
+                         f"({hit.sum() / (rows * len(hit)) * 100:.2f}%), {int(self.steps[layer].sum())} steps, "
+                         f"worst neuron {int(hit.argmax())} in {int(hit.max())} samples")
+        return lines
+
+def align_bias(biases, f_b, f_prod):
+    """Bias shifted from f_b to f_prod fractional bits (arithmetic shift)."""
+    biases = np.asarray(biases, dtype=np.int64).reshape(-1)
+    shift = f_b - f_prod
+    return biases >> shift if shift >= 0 else biases << -shift
+
+# ---------- NARROW DTYPES / HEADROOM ----------
+def value_bits(values):
+    """Signed two's complement bits needed to hold every value (at least 1)."""
+    values = np.asarray(values)
+    if values.size == 0:
+        return 1
+    lo, hi = int(values.min()), int(values.max())
+    return max(hi.bit_length(), (-lo - 1).bit_length()) + 1
+
+def headroom_bits(weights, aligned_bias, a_bits):
+    """
+    Signed bits of the largest possible sum of one layer, products plus the
+    aligned bias, for inputs of a_bits. Never more than the generic
+    a_bits + w_bits + clog2(fan_in) + 1.
+    """
+    w_abs = np.abs(np.asarray(weights, dtype=np.int64)).sum(axis=1)
+    b_abs = np.abs(np.asarray(aligned_bias, dtype=np.int64).reshape(-1))
+    a_max = 1 << (a_bits - 1)
+    bound = max((int(w) * a_max + int(b) for w, b in zip(w_abs, b_abs)), default=0)
+    return bound.bit_length() + 1
+
+def narrow_plan(weights, aligned, n_a):
+    """
+    Per layer (weight storage dtype, accumulator dtype, headroom bits), see
+    ACC_DTYPES. Raises OverflowError if a layer cannot be summed exactly.
+    """
+    plan = []
+    for l, (w, b) in enumerate(zip(weights, aligned)):
+        bits = headroom_bits(w, b, n_a)
+        acc_dtype = next((dt for dt, limit in ACC_DTYPES if bits <= limit), None)
+        if acc_dtype is None:
+            raise OverflowError(f"layer {l + 1}: sums need up to {bits} bits, more than int64 holds "
+                                f"with {n_a}-bit activations; use narrower activations or weights")
+        plan.append((storage_dtype(value_bits(w)), np.dtype(acc_dtype), bits))
+    return plan
+
+# ---------- BATCHED INTEGER ENGINE ----------
+def fixed_forward(X_fixed, weights, biases, f_in, f_prod, f_b, n_a, x_a, trace=None, rows=None,
+                  acc_bits=None, sat_stats=None, narrow=False, sparsity=None):
+    """
+    Runs (N, in_dim) fixed-point inputs with f_in fractional bits through
+    every layer. weights[l] is (out_dim, in_dim) and biases[l] is (out_dim,)
+    integers. f_prod and f_b are scalars or one value per layer.
+
+    acc_bits (scalar or per layer) switches the sum of products to
+    block_booth.sv's per-column saturating accumulator; None keeps the
+    unbounded int64 sum. sat_stats, a SaturationStats, collects how often
+    it saturated.
+
+    narrow=True stores weights and activations in narrow dtypes and sums in
+    the cheapest exact accumulator (see ACC_DTYPES and narrow_plan()); it
+    raises OverflowError when the static headroom bound exceeds int64.
+    Results are identical, but outputs come back in the activation dtype.
+
+    sparsity, a SparsityStats, records every layer's nonzero inputs per
+    sample and switches to zero-skipping execution (zero_skip_matmul), which
+    multiplies only nonzero activations; results are identical.
+
+    trace, if given, is called as trace(layer, point, values, rows) at every
+    TRACE_POINTS tap, with rows the sample numbers of this batch (default
+    0..N-1). With trace=None nothing extra is computed or copied.
+
+    Returns the (N, classes) int64 output-layer activations in Q(n_a, x_a)
+    (no ReLU on the last layer, no softmax).
+    """
+    num_layers = len(weights)
+    f_prod = _per_layer(f_prod, num_layers)
+    f_b = _per_layer(f_b, num_layers)
+    acc_bits = _per_layer(acc_bits, num_layers)
+    aligned = [align_bias(b, fb, fp) for b, fb, fp in zip(biases, f_b, f_prod)]
+    if narrow:
+        plan = narrow_plan(weights, aligned, n_a)
+        weights_t = [np.asarray(w).astype(w_dt).T for w, (w_dt, _, _) in zip(weights, plan)]
+        operands = [w.astype(acc_dt) for w, (_, acc_dt, _) in zip(weights_t, plan)]
+        act_dtype = storage_dtype(n_a)
+    else:
+        weights_t = [np.asarray(w, dtype=np.int64).T for w in weights]
+        act_dtype = np.int64
+
+    def products(l, a):
+        if sparsity is not None and acc_bits[l] is None:
+            return zero_skip_matmul(a, weights_t[l], sparsity, l)
+        if acc_bits[l] is not None:
+            if sparsity is not None:
+                # Adding a zero product never changes a saturated sum, so skipping is exact here too
+                sparsity.add(l, a, weights_t[l].shape[1])
+            return saturating_matmul(a.astype(np.int64, copy=False), weights_t[l].astype(np.int64, copy=False),
+                                     acc_bits[l], sat_stats, l)
+        if narrow:
+            return (a.astype(plan[l][1]) @ operands[l]).astype(np.int64)
+        return a @ weights_t[l]
+
+    a = requantize(X_fixed, f_in, n_a, x_a).astype(act_dtype, copy=False)
+    if trace is None:
+        for l in range(num_layers):
+            a = requantize(products(l, a) + aligned[l], f_prod[l], n_a, x_a).astype(act_dtype, copy=False)
+            if l < num_layers - 1:
+                a = np.maximum(a, 0)
+        return a
+
+    if rows is None:
+        rows = np.arange(len(a))
+    for l in range(num_layers):
+        acc = products(l, a)
+        trace(l, "acc", acc, rows)
+        shifted = shift_round(acc + aligned[l], f_prod[l] - (n_a - x_a))
+        trace(l, "shifted", shifted, rows)
+        a = saturate(shifted, n_a).astype(act_dtype, copy=False)
+        trace(l, "saturated", a, rows)
+        if l < num_layers - 1:
+            a = np.maximum(a, 0)
+            trace(l, "relu", a, rows)
+    return a
+
+def fixed_predict(X_fixed, weights, biases, f_in, f_prod, f_b, n_a, x_a, y=None,
+                  batch_size=BATCH_ROWS, trace=None, acc_bits=None, sat_stats=None, narrow=False,
+                  sparsity=None):
+    """
+    fixed_forward() over the test set in batches.
+    Returns (predictions, outputs, accuracy); accuracy is a percentage or None.
+
+    Softmax in float is monotonic, so the prediction is the argmax of the
+    integer outputs directly. trace is passed on with the absolute sample
+    numbers of each batch.
+    """
+    X_fixed = np.asarray(X_fixed)
+    blocks = []
+    for start in range(0, len(X_fixed), batch_size):
+        batch = X_fixed[start:start + batch_size]
+        rows = np.arange(start, start + len(batch)) if trace is not None else None
+        blocks.append(fixed_forward(batch, weights, biases, f_in, f_prod, f_b, n_a, x_a, trace, rows,
+                                    acc_bits, sat_stats, narrow, sparsity))
+    outputs = np.concatenate(blocks) if blocks else np.zeros((0, len(biases[-1])), dtype=np.int64)
+    predictions = np.argmax(outputs, axis=1)
+    accuracy = None
+    if y is not None and len(predictions):
+        accuracy = float(np.mean(predictions == np.asarray(y))) * 100
+    return predictions, outputs, accuracy
+
+# ---------- TRACING ----------
+def _compact(values):
+    """Smallest signed integer dtype that holds every value."""
+    if values.size == 0:
+        return values.astype(np.int8)
+    lo, hi = int(values.min()), int(values.max())
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return values.astype(dtype)
+    return values
+
+class FixedTracer:
+    """
+    Collects tap values from fixed_forward()/fixed_predict().
+
+    layers (0-based), points (see TRACE_POINTS) and samples restrict what is
+    kept; None keeps everything. callbacks are extra functions called as
+    callback(layer, point, values, rows) with only the selected rows.
+
+        tracer = FixedTracer(layers=[0], points=["acc", "saturated"], samples=[3, 17])
+        fixed_predict(..., trace=tracer)
+        tracer.save("trace.npz")   # layer1_acc, layer1_acc_rows, ...
+    """
+
+    def __init__(self, layers=None, points=None, samples=None, callbacks=()):
+        self.layers = None if layers is None else set(layers)
+        self.points = None if points is None else set(points)
+        if self.points is not None and not self.points <= set(TRACE_POINTS):
+            raise ValueError(f"unknown trace points {sorted(self.points - set(TRACE_POINTS))}, expected {TRACE_POINTS}")
+        self.samples = None if samples is None else np.asarray(sorted(samples), dtype=np.int64)
+        self.callbacks = list(callbacks)
+        self._chunks = {}
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def __call__(self, layer, point, values, rows):
+        if self.layers is not None and layer not in self.layers:
+            return
+        if self.points is not None and point not in self.points:
+            return
+        if self.samples is not None:
+            keep = np.isin(rows, self.samples)
+            if not keep.any():
+                return
+            values, rows = values[keep], rows[keep]
+        else:
+            values = values.copy()
+        for callback in self.callbacks:
+            callback(layer, point, values, rows)
+        self._chunks.setdefault((layer, point), []).append((rows, values))
+
+    def arrays(self):
+        """{"layer1_acc": (samples, neurons) values, "layer1_acc_rows": sample numbers, ...}"""
+        out = {}
+        for (layer, point), chunks in sorted(self._chunks.items()):
+            name = f"layer{layer + 1}_{point}"
+            out[name] = _compact(np.concatenate([values for _, values in chunks]))
+            out[name + "_rows"] = np.concatenate([rows for rows, _ in chunks]).astype(np.int32)
+        return out
+
+    def save(self, filename):
+        """Writes the traced values as one .npz of narrow integer arrays."""
+        np.savez_compressed(filename, **self.arrays())
+        return filename
+
+# ---------- SCALAR REFERENCE ----------
+def _reference_quantize(val_int, current_frac_bits, n, x):
+    shift_amount = current_frac_bits - (n - x)
+    if shift_amount < 0:
+        shifted_val = int(val_int) << -shift_amount
+    else:
+        round_bias = 1 << (shift_amount - 1) if shift_amount > 0 else 0
+        rounded_val = int(val_int) + round_bias if val_int >= 0 else int(val_int) - round_bias
+        shifted_val = rounded_val >> shift_amount
+    return min(max(shifted_val, -(1 << (n - 1))), (1 << (n - 1)) - 1)
+
+def reference_forward(x_fixed, weights, biases, f_in, f_prod, f_b, n_a, x_a, acc_bits=None):
+    """
+    One sample through the per-neuron, per-MAC loops of the original
+    sw_test_88.py (Python ints, so nothing wraps). With acc_bits, every MAC
+    saturates like block_booth.sv. Slow; used by check().
+    """
+    num_layers = len(weights)
+    f_prod = _per_layer(f_prod, num_layers)
+    f_b = _per_layer(f_b, num_layers)
+    acc_bits = _per_layer(acc_bits, num_layers)
+    current = [_reference_quantize(v, f_in, n_a, x_a) for v in x_fixed]
+    for l in range(num_layers):
+        output = []
+        for out_idx in range(len(weights[l])):
+            accumulator = 0
+            for in_idx in range(len(current)):
+                accumulator += current[in_idx] * int(weights[l][out_idx][in_idx])
+                if acc_bits[l] is not None:
+                    accumulator = min(max(accumulator, -(1 << (acc_bits[l] - 1))), (1 << (acc_bits[l] - 1)) - 1)
+            shift = f_b[l] - f_prod[l]
+            bias = int(biases[l][out_idx])
+            accumulator += bias >> shift if shift >= 0 else bias << -shift
+            q = _reference_quantize(accumulator, f_prod[l], n_a, x_a)
+            output.append(max(0, q) if l < num_layers - 1 else q)
+        current = output
+    return current
+
+# ---------- EQUIVALENCE CHECK ----------
+# The shipped block_temp_inference export: Q(8,4) pixels, Q(32,16) weights
+# with Q(64,32) biases on the hidden layers and Q(8,4)/Q(16,8) on the output.
+SHIPPED_IN = (8, 4)
+SHIPPED_W = [(32, 16), (32, 16), (8, 4)]
+SHIPPED_B = [(64, 32), (64, 32), (16, 8)]
+SHIPPED_A = (32, 16)
+
+def check(directory, n_a=SHIPPED_A[0], x_a=SHIPPED_A[1], samples=None, acc_bits=None):
+    """
+    Compares fixed_forward(), plain, narrow, zero-skipping and traced, to reference_forward() on the shipped
+    test_88.mem and layerN_*.mem in directory. acc_bits selects the saturating
+    accumulator. Returns (ok, samples checked, SaturationStats).
+    """
+    directory = Path(directory)
+    X_fixed, _, _ = load_mem_dataset(directory / "test_88.mem", *SHIPPED_IN, num_features=64, fmt="bin")
+    if samples is not None:
+        X_fixed = X_fixed[:samples]
+    weights, biases = [], []
+    for k, (wq, bq) in enumerate(zip(SHIPPED_W, SHIPPED_B), start=1):
+        weights.append(load_mem_params(directory / f"layer{k}_weights.mem", *wq, fmt="bin")[0])
+        biases.append(load_mem_params(directory / f"layer{k}_biases.mem", *bq, num_fields=1, fmt="bin")[0][:, 0])
+
+    f_in = SHIPPED_IN[0] - SHIPPED_IN[1]
+    f_a = n_a - x_a
+    f_prod = [f_a + (n - x) for n, x in SHIPPED_W]
+    f_b = [n - x for n, x in SHIPPED_B]
+    stats = SaturationStats()
+    fast = fixed_forward(X_fixed, weights, biases, f_in, f_prod, f_b, n_a, x_a, acc_bits=acc_bits, sat_stats=stats)
+    narrow = fixed_forward(X_fixed, weights, biases, f_in, f_prod, f_b, n_a, x_a, acc_bits=acc_bits, narrow=True)
+    skipped = fixed_forward(X_fixed, weights, biases, f_in, f_prod, f_b, n_a, x_a, acc_bits=acc_bits,
+                            sparsity=SparsityStats())
+    traced = fixed_forward(X_fixed, weights, biases, f_in, f_prod, f_b, n_a, x_a, trace=FixedTracer(),
+                           acc_bits=acc_bits)
+    slow = np.array([reference_forward(x, weights, biases, f_in, f_prod, f_b, n_a, x_a, acc_bits) for x in X_fixed])
+    ok = all(np.array_equal(out, slow) for out in (fast, narrow, skipped, traced))
+    return ok, len(X_fixed), stats
+
+# ---------- COMMAND LINE ----------
+# python -m ann_sw.fixed_inference check [block_temp_inference] [N_A X_A [ACC_BITS]]
+# The default cases include narrow saturating accumulators (24 bits saturates
+# about half of the first-layer sums) so the per-step clamping is exercised.
+CHECK_CASES = [(SHIPPED_A[0], SHIPPED_A[1], None), (16, 8, None), (12, 4, None), (12, 4, 24), (12, 4, 28)]
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "check" and len(args) in (1, 2, 4, 5):
+        directory = args[1] if len(args) > 1 else Path(__file__).resolve().parent.parent / "block_temp_inference"
+        cases = CHECK_CASES
+        if len(args) >= 4:
+            cases = [(int(args[2]), int(args[3]), int(args[4]) if len(args) == 5 else None)]
+        all_ok = True
+        for n_a, x_a, acc_bits in cases:
+            ok, count, stats = check(directory, n_a, x_a, acc_bits=acc_bits)
+            all_ok &= ok
+            acc = f"{acc_bits}-bit saturating" if acc_bits else "int64"
+            print(f"Q({n_a},{x_a}) activations, {acc} accumulator: {count} samples "
+                  f"{'bit-identical' if ok else 'MISMATCH'}")
+            for line in stats.summary():
+                print(f"  {line}")
+        sys.exit(0 if all_ok else 1)
+    else:
+        print("Usage: python -m ann_sw.fixed_inference check [DIR] [N_A X_A [ACC_BITS]]")
+        sys.exit(1)
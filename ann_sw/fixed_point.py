@@ -0,0 +1,365 @@
+import sys
+
+import numpy as np
+
+from ann_sw.mem_decode import bits_to_fixed, fixed_to_float, load_mem_params
+from ann_sw.mem_hex import bit_chars_to_hex_chars
+
+# ---------- PARAMETERS ----------
+# The one fixed-point implementation of the repo: quantize(), shift_right()
+# and saturate_raw() are what mem_encode.quantize_to_fixed() and
+# fixed_inference's shift_round()/saturate()/requantize() call, and
+# FixedArray wraps them for the scripts. Q(n, x): n total bits, x integer
+# bits including the sign bit, n - x fractional bits, two's complement.
+#
+# Rounding modes, for float -> fixed and for dropping fractional bits:
+#   half_even  nearest, ties to even: Python round() / np.round, used by
+#              the .mem exporters (quantize_to_fixed())
+#   half_up    nearest, ties toward +inf: add half an LSB, then floor
+#   half_away  nearest, ties away from zero
+#   floor      toward -inf: a plain arithmetic shift
+#   truncate   toward zero
+#   sign_bias  add half an LSB to non-negative values, subtract it from
+#              negative ones, then floor: the datapath's requantization
+#              (fixed_inference.shift_round())
+# Float values are rounded first and saturated after, which gives the same
+# integers as clamping to [-2^(x-1), 2^(x-1) - 2^-(n-x)] before rounding.
+ROUNDING_MODES = ("half_even", "half_up", "half_away", "floor", "truncate", "sign_bias")
+
+_FLOAT_ROUND = {
+    "half_even": np.round,
+    "half_up": lambda v: np.floor(v + 0.5),
+    "half_away": lambda v: np.sign(v) * np.floor(np.abs(v) + 0.5),
+    "floor": np.floor,
+    "truncate": np.trunc,
+    "sign_bias": lambda v: np.where(v >= 0, np.floor(v + 0.5), np.floor(v - 0.5)),
+}
+
+def _check_rounding(rounding):
+    if rounding not in ROUNDING_MODES:
+        raise ValueError(f"Unknown rounding '{rounding}', expected one of {ROUNDING_MODES}")
+
+def _clog2(k):
+    return max(0, int(k - 1).bit_length())
+
+# ---------- INTEGER HELPERS ----------
+def quantize(values, n, x, rounding="half_even", scale=1.0):
+    """values / scale as Q(n, x) int64: scaled by 2^(n - x), rounded, then saturated to n bits."""
+    _check_rounding(rounding)
+    scaled = np.asarray(values, dtype=np.float64) / scale * float(1 << (n - x))
+    clipped = np.clip(_FLOAT_ROUND[rounding](scaled), -float(1 << (n - 1)), float(1 << (n - 1)) - 1)
+    if n < 64:
+        return clipped.astype(np.int64)
+    # 2^63 - 1 has no float64 form: the clip leaves 2^63, which the cast would wrap.
+    with np.errstate(invalid="ignore"):
+        result = np.asarray(clipped.astype(np.int64))
+    result[clipped >= 2.0 ** 63] = (1 << 63) - 1
+    return result
+
+def shift_right(values, shift, rounding="half_even"):
+    """int64 values / 2^shift rounded with the given mode; a negative shift is an exact left shift."""
+    _check_rounding(rounding)
+    v = np.asarray(values, dtype=np.int64)
+    if shift <= 0:
+        return v << -shift
+    half = np.int64(1 << (shift - 1))
+    if rounding == "floor":
+        return v >> shift
+    if rounding == "half_up":
+        return (v + half) >> shift
+    if rounding == "half_away":
+        return np.where(v >= 0, (v + half) >> shift, -((-v + half) >> shift))
+    if rounding == "truncate":
+        return np.where(v >= 0, v >> shift, -((-v) >> shift))
+    if rounding == "sign_bias":
+        return np.where(v >= 0, v + half, v - half) >> shift
+    q = v >> shift
+    r = v & np.int64((1 << shift) - 1)
+    return q + ((r > half) | ((r == half) & (q & 1).astype(bool)))
+
+def saturate_raw(values, n):
+    """Clamps integers to the n-bit two's complement range (int64)."""
+    return np.clip(np.asarray(values, dtype=np.int64), -(1 << (n - 1)), (1 << (n - 1)) - 1)
+
+def wrap_raw(values, n):
+    """Two's complement wraparound to n bits, as an n-bit register would (int64)."""
+    v = np.asarray(values, dtype=np.int64)
+    if n >= 64:
+        return v
+    u = v & np.int64((1 << n) - 1)
+    return np.where(u >= (1 << (n - 1)), u - np.int64(1 << n), u)
+
+# ---------- ARRAY TYPE ----------
+class FixedArray:
+    """
+    Integer NumPy buffer plus its Q(n, x) format.
+
+        w = FixedArray.from_float(weights, 11, 5)       # round + saturate
+        acc = FixedArray.from_float(x, 11, 5) @ w.T     # widening matmul
+        a = acc.rescale(11, 5, rounding="sign_bias")    # back to Q(11, 5)
+        chars = a.to_bit_chars()                        # $readmemb text
+
+    raw holds the signed values (any integer dtype; arithmetic is done in
+    int64). Products and sums widen their format so nothing is lost until
+    rescale()/saturate() narrows it again. Indexing a single element gives a
+    FixedScalar.
+    """
+
+    __slots__ = ("raw", "n", "x")
+
+    def __init__(self, raw, n, x):
+        raw = np.asarray(raw)
+        if raw.dtype.kind not in "iu":
+            raise TypeError(f"FixedArray needs an integer buffer, got {raw.dtype}")
+        self.raw = raw
+        self.n = int(n)
+        self.x = int(x)
+
+    # ----- construction -----
+    @classmethod
+    def from_float(cls, values, n, x, rounding="half_even", scale=1.0):
+        """values / scale quantized to Q(n, x): rounded, then saturated to n bits (see quantize())."""
+        return cls(quantize(values, n, x, rounding, scale), n, x)
+
+    @classmethod
+    def from_unsigned(cls, values, n, x):
+        """From the n-bit unsigned (two's complement) codes the scalar helpers return."""
+        return cls(wrap_raw(np.asarray(values, dtype=np.uint64).astype(np.int64), n), n, x)
+
+    @classmethod
+    def from_bits(cls, bits, n, x):
+        """From a (rows, k * n) array of 0/1 bits, MSB first, k values per row."""
+        return cls(bits_to_fixed(bits, n), n, x)
+
+    @classmethod
+    def from_bin_str(cls, bin_str, n, x):
+        """From a '0'/'1' string of one or more n-bit fields, MSB first."""
+        bits = np.frombuffer(bin_str.strip().encode("ascii"), dtype=np.uint8) - np.uint8(ord("0"))
+        return cls.from_bits(bits.reshape(1, -1), n, x).reshape(-1)
+
+    @classmethod
+    def load_mem(cls, filename, n, x, num_fields=None, fmt="auto"):
+        """(rows, num_fields) FixedArray of a weight or bias .mem file."""
+        return cls(load_mem_params(filename, n, x, num_fields=num_fields, fmt=fmt)[0], n, x)
+
+    # ----- format -----
+    @property
+    def frac(self):
+        return self.n - self.x
+
+    @property
+    def shape(self):
+        return self.raw.shape
+
+    def __len__(self):
+        return len(self.raw)
+
+    def reshape(self, *shape):
+        return FixedArray(self.raw.reshape(*shape), self.n, self.x)
+
+    @property
+    def T(self):
+        return FixedArray(self.raw.T, self.n, self.x)
+
+    def __getitem__(self, index):
+        raw = self.raw[index]
+        if np.ndim(raw) == 0:
+            return FixedScalar(int(raw), self.n, self.x)
+        return FixedArray(raw, self.n, self.x)
+
+    def compact(self):
+        """Same values in the narrowest int8/16/32/64 buffer that holds n bits."""
+        from ann_sw.model_bundle import storage_dtype
+        return FixedArray(self.raw.astype(storage_dtype(self.n)), self.n, self.x)
+
+    def _wide(self):
+        return self.raw.astype(np.int64, copy=False)
+
+    # ----- conversion -----
+    def to_float(self):
+        """float64 values raw / 2^(n - x)."""
+        return fixed_to_float(self._wide(), self.n, self.x)
+
+    def to_unsigned(self):
+        """n-bit two's complement codes as uint64, e.g. for int_to_bin_str / format(v, 'b')."""
+        codes = self._wide() & np.int64((1 << self.n) - 1) if self.n < 64 else self._wide()
+        return codes.astype(np.uint64)
+
+    def to_bit_chars(self):
+        """
+        (rows, k * n) uint8 ASCII '0'/'1', MSB first, one row per line of a
+        $readmemb file. A 1-D array gives one value per row, as in bias files.
+        """
+        from ann_sw.mem_encode import fixed_to_bit_chars
+        raw = self._wide()
+        return fixed_to_bit_chars(raw.reshape(raw.shape + (1,)) if raw.ndim < 2 else raw, self.n)
+
+    def to_hex_chars(self):
+        """Like to_bit_chars() but $readmemh digits (n rounded up to whole nibbles)."""
+        return bit_chars_to_hex_chars(self.to_bit_chars())
+
+    # ----- arithmetic -----
+    def __mul__(self, other):
+        """Widening elementwise product: Q(n1 + n2, x1 + x2)."""
+        other = _as_fixed(other)
+        return FixedArray(self._wide() * other._wide(), self.n + other.n, self.x + other.x)
+
+    def __matmul__(self, other):
+        """Widening matrix product; the fan-in k adds clog2(k) integer bits."""
+        other = _as_fixed(other)
+        k = self.raw.shape[-1]
+        grow = _clog2(k)
+        return FixedArray(self._wide() @ other._wide(), self.n + other.n + grow, self.x + other.x + grow)
+
+    def __add__(self, other):
+        """Aligned sum: fractional bits aligned to the finer operand (exact), one extra integer bit."""
+        other = _as_fixed(other)
+        frac = max(self.frac, other.frac)
+        x = max(self.x, other.x) + 1
+        total = self._wide() << (frac - self.frac)
+        total = total + (other._wide() << (frac - other.frac))
+        return FixedArray(total, x + frac, x)
+
+    def __neg__(self):
+        return FixedArray(-self._wide(), self.n + 1, self.x + 1)
+
+    def __sub__(self, other):
+        return self + (-_as_fixed(other))
+
+    def align(self, frac):
+        """Same values with frac fractional bits; dropping bits floors like an arithmetic shift."""
+        return self.rescale(self.x + frac, self.x, rounding="floor", saturate=False)
+
+    def rescale(self, n, x, rounding="half_even", saturate=True):
+        """
+        Re-quantizes to Q(n, x): fractional bits are dropped with the given
+        rounding mode (or appended exactly), then the result is saturated
+        to n bits, or wrapped like an n-bit register with saturate=False.
+        """
+        shifted = shift_right(self._wide(), self.frac - (n - x), rounding)
+        return FixedArray(saturate_raw(shifted, n) if saturate else wrap_raw(shifted, n), n, x)
+
+    def saturate(self, n=None):
+        """Clamped to n bits (default: this format's n), same fractional bits."""
+        n = self.n if n is None else n
+        return FixedArray(saturate_raw(self.raw, n), n, n - self.frac)
+
+    def relu(self):
+        return FixedArray(np.maximum(self.raw, 0), self.n, self.x)
+
+    def overflows(self, n=None):
+        """Boolean mask of values outside the n-bit range (default: this format's n)."""
+        n = self.n if n is None else n
+        raw = self._wide()
+        return (raw < -(1 << (n - 1))) | (raw > (1 << (n - 1)) - 1)
+
+    def __eq__(self, other):
+        other = _as_fixed(other)
+        return (self.n, self.x) == (other.n, other.x) and np.array_equal(self.raw, other.raw)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"FixedArray(Q({self.n},{self.x}), shape={self.raw.shape}, dtype={self.raw.dtype})"
+
+def _as_fixed(value):
+    if isinstance(value, FixedArray):
+        return value
+    if isinstance(value, FixedScalar):
+        return FixedArray(np.int64(value.raw), value.n, value.x)
+    raise TypeError(f"expected a FixedArray or FixedScalar, got {type(value).__name__}")
+
+# ---------- SCALAR ----------
+class FixedScalar:
+    """
+    One Q(n, x) value, for the rare single-value case (a testbench
+    constant, one bias). Arithmetic goes through FixedArray.
+
+        FixedScalar.from_float(0.7, 11, 5).bin()        # '00000101101'
+    """
+
+    __slots__ = ("raw", "n", "x")
+
+    def __init__(self, raw, n, x):
+        self.raw = int(raw)
+        self.n = int(n)
+        self.x = int(x)
+
+    @classmethod
+    def from_float(cls, value, n, x, rounding="half_even"):
+        return FixedArray.from_float(value, n, x, rounding)[()]
+
+    @classmethod
+    def from_bin_str(cls, bin_str, n, x):
+        return FixedArray.from_bin_str(bin_str, n, x)[0]
+
+    def __float__(self):
+        return self.raw / (1 << (self.n - self.x))
+
+    def __int__(self):
+        return self.raw
+
+    def unsigned(self):
+        return self.raw & ((1 << self.n) - 1)
+
+    def bin(self):
+        """n-character two's complement string, as in a $readmemb line."""
+        return format(self.unsigned(), f"0{self.n}b")
+
+    def hex(self):
+        return format(self.unsigned(), f"0{(self.n + 3) // 4}x")
+
+    def __eq__(self, other):
+        return isinstance(other, FixedScalar) and (self.raw, self.n, self.x) == (other.raw, other.n, other.x)
+
+    def __hash__(self):
+        return hash((self.raw, self.n, self.x))
+
+    def __repr__(self):
+        return f"FixedScalar({float(self)!r}, Q({self.n},{self.x}), raw={self.raw})"
+
+# ---------- SELF-CHECK ----------
+# (values, n, x, expected raw): saturation at both ends, ties to even, and
+# Q(64,32), the bias format, where 2^63 - 1 has no float64 form.
+CHECK_CASES = [
+    ([1e30, -1e30, 0.5, 1.5, -2.5, 3.0], 8, 4, [127, -128, 8, 24, -40, 48]),
+    ([2.0 ** 40, -(2.0 ** 40), 2.0 ** 31, -(2.0 ** 31), 0.25], 64, 32,
+     [(1 << 63) - 1, -(1 << 63), (1 << 63) - 1, -(1 << 63), 1 << 30]),
+    ([0.5, -1.0, 1.0], 64, 1, [1 << 62, -(1 << 63), (1 << 63) - 1]),
+]
+
+def check():
+    """
+    Compares quantize(), FixedArray.from_float() and
+    mem_encode.quantize_to_fixed() on CHECK_CASES and the rescale() /
+    fixed_inference.requantize() paths on random sums. Returns a list of
+    failure messages (empty when everything matches).
+    """
+    from ann_sw.fixed_inference import requantize
+    from ann_sw.mem_encode import quantize_to_fixed
+    failures = []
+    for values, n, x, expected in CHECK_CASES:
+        for name, raw in (("quantize", quantize(values, n, x)),
+                          ("FixedArray.from_float", FixedArray.from_float(values, n, x).raw),
+                          ("quantize_to_fixed", quantize_to_fixed(values, n, x))):
+            if raw.tolist() != expected:
+                failures.append(f"{name} Q({n},{x}): {raw.tolist()}, expected {expected}")
+    sums = np.random.default_rng(0).integers(-(1 << 40), 1 << 40, size=4096)
+    for frac, n, x in ((24, 12, 4), (32, 32, 16), (8, 16, 4)):
+        a = FixedArray(sums, frac + 24, 24).rescale(n, x, rounding="sign_bias").raw
+        if not np.array_equal(a, requantize(sums, frac, n, x)):
+            failures.append(f"rescale/requantize Q({n},{x}) from {frac} fractional bits differ")
+    return failures
+
+# ---------- COMMAND LINE ----------
+# python -m ann_sw.fixed_point check
+if __name__ == "__main__":
+    if sys.argv[1:] == ["check"]:
+        failures = check()
+        for line in failures:
+            print(line)
+        print("fixed_point check " + ("FAILED" if failures else "OK"))
+        sys.exit(1 if failures else 0)
+    else:
+        print("Usage: python -m ann_sw.fixed_point check")
+        sys.exit(1)
@@ -0,0 +1,81 @@
+import numpy as np
+
+# ---------- ACTIVATIONS ----------
+def relu(x):
+    return np.maximum(x, 0)
+
+def softmax(x):
+    """Row-wise softmax of a (N, classes) array (or a single vector)."""
+    e = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    return e / np.sum(e, axis=-1, keepdims=True)
+
+def identity(x):
+    return x
+
+ACTIVATIONS = {"relu": relu, "softmax": softmax, "linear": identity}
+
+# ---------- BATCHED FLOAT INFERENCE ----------
+def forward(X, weights, biases, activations=None, trace=None, sparsity=None):
+    """
+    Runs a (N, in_dim) batch through every layer as X @ W.T + b.
+
+    weights[l] is (out_dim, in_dim) as exported, biases[l] is (out_dim,).
+    activations defaults to ReLU on hidden layers. The output layer's
+    activation is not applied, so the result is the (N, classes) logits:
+    softmax is monotonic and argmax/accuracy do not need it.
+
+    trace, if given, is called as trace(layer, values) with every layer's
+    output (after the activation on hidden layers). sparsity, a
+    ann_sw.sparsity.SparsityStats, counts every layer's nonzero inputs per
+    sample; the float GEMMs stay dense.
+    """
+    if activations is None:
+        activations = ["relu"] * (len(weights) - 1) + ["softmax"]
+    x = np.asarray(X, dtype=np.float64)
+    for l, (w, b) in enumerate(zip(weights, biases)):
+        if sparsity is not None:
+            sparsity.add(l, x, len(w))
+        x = x @ np.asarray(w, dtype=np.float64).T + np.asarray(b, dtype=np.float64).reshape(-1)
+        if l < len(weights) - 1:
+            x = ACTIVATIONS[activations[l]](x)
+        if trace is not None:
+            trace(l, x)
+    return x
+
+def predict(X, weights, biases, y=None, batch_size=None, activations=None, sparsity=None):
+    """
+    Batched evaluation of a whole test set.
+
+    Processes batch_size samples per GEMM (all at once when None) and
+    returns (predictions, logits, accuracy). accuracy is a percentage, or
+    None when no labels y are given. Apply softmax(logits) if
+    probabilities are needed.
+    """
+    X = np.asarray(X)
+    if batch_size is None:
+        batch_size = max(1, len(X))
+    blocks = [forward(X[start:start + batch_size], weights, biases, activations, sparsity=sparsity)
+              for start in range(0, len(X), batch_size)]
+    logits = np.concatenate(blocks) if blocks else np.zeros((0, len(biases[-1])))
+    predictions = np.argmax(logits, axis=1)
+    accuracy = None
+    if y is not None and len(predictions):
+        accuracy = float(np.mean(predictions == np.asarray(y))) * 100
+    return predictions, logits, accuracy
+
+def predict_batches(batches, weights, biases, activations=None, sparsity=None):
+    """
+    predict() over an iterable of (X_batch, y_batch), e.g. a MemBatchReader.
+    Returns (predictions, logits, accuracy) for all batches together.
+    """
+    predictions, logits, labels = [], [], []
+    for X_batch, y_batch in batches:
+        pred, batch_logits, _ = predict(X_batch, weights, biases, activations=activations, sparsity=sparsity)
+        predictions.append(pred)
+        logits.append(batch_logits)
+        labels.append(np.asarray(y_batch))
+    if not predictions:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, len(biases[-1]))), None
+    predictions, logits = np.concatenate(predictions), np.concatenate(logits)
+    accuracy = float(np.mean(predictions == np.concatenate(labels))) * 100
+    return predictions, logits, accuracy
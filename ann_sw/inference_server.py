@@ -0,0 +1,479 @@
+import http.client
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+from ann_sw.fixed_inference import align_bias, fixed_forward, narrow_plan
+from ann_sw.inference import forward
+from ann_sw.mem_decode import fixed_to_float, load_mem_params
+from ann_sw.model_bundle import ModelBundle, default_activations, find_layer_files
+
+# ---------- PARAMETERS ----------
+# A long-running reference model for testbench generators and notebooks:
+# the model is parsed once, requests from all connections are queued and
+# run together as one micro-batch, and the weight files are watched for
+# changes.
+#
+#   POST /predict  {"samples": [[...], ...] or [...],
+#                   "format": "float" | "fixed", "frac_bits": F,
+#                   "activations": false}
+#               -> {"predictions", "outputs", "activations"?, "latency_ms", "model_version"}
+#   GET  /model    layer dims, Q-formats, engine, version
+#   GET  /metrics  request/sample counts, throughput, latency percentiles
+#   POST /reload   reload the model files now
+#
+# "fixed" samples are raw two's complement integers with frac_bits
+# fractional bits (default: the activation format, or for the float engine
+# the first layer's weight format, as in the train_sw datasets); "float" samples are
+# real values. The float engine returns logits, the fixed engine the
+# Q(N_A, X_A) integer outputs of ann_sw.fixed_inference.
+DEFAULT_PORT = 8765
+MAX_BATCH = 1024            # samples per micro-batch
+MAX_DELAY = 0.002           # seconds the first request of a batch waits for others
+RELOAD_CHECK = 1.0          # seconds between checks of the model files' mtimes
+LATENCY_WINDOW = 10000      # recent requests kept for the latency percentiles
+
+# ---------- MODEL ----------
+def _per_layer(fmt, num_layers):
+    return [tuple(f) for f in fmt] if isinstance(fmt[0], (tuple, list)) else [tuple(fmt)] * num_layers
+
+class ServedModel:
+    """
+    An exported model loaded once: a .annb bundle, or a directory of
+    layerN_weights.mem / layerN_biases.mem with the given Q-formats
+    (one (n, x) for all layers or one per layer, as in bundle_from_mem()).
+
+    a_format=(N_A, X_A) selects the bit-exact integer engine, None the
+    float engine.
+    """
+
+    def __init__(self, source, w_format=None, b_format=None, a_format=None, fmt="auto"):
+        self.source = Path(source)
+        self.a_format = tuple(a_format) if a_format is not None else None
+        if self.source.is_dir():
+            pairs = find_layer_files(self.source)
+            if not pairs:
+                raise FileNotFoundError(f"no layer1_weights/layer1_biases files in {source}")
+            if w_format is None or b_format is None:
+                raise ValueError("a model directory needs the weight and bias Q-formats")
+            self.files = [f for pair in pairs for f in pair]
+            self.w_formats = _per_layer(w_format, len(pairs))
+            self.b_formats = _per_layer(b_format, len(pairs))
+            self.weights, self.biases = [], []
+            for (w_file, b_file), wq, bq in zip(pairs, self.w_formats, self.b_formats):
+                self.weights.append(load_mem_params(w_file, *wq, fmt=fmt)[0])
+                self.biases.append(load_mem_params(b_file, *bq, num_fields=1, fmt=fmt)[0][:, 0])
+            self.activations = default_activations(len(pairs))
+        else:
+            bundle = ModelBundle(self.source)
+            self.files = [self.source]
+            self.w_formats = [layer.w_format for layer in bundle]
+            self.b_formats = [layer.b_format for layer in bundle]
+            self.weights = [np.array(layer.weights, dtype=np.int64) for layer in bundle]
+            self.biases = [np.array(layer.biases, dtype=np.int64) for layer in bundle]
+            self.activations = [layer.activation for layer in bundle]
+        self.signature = files_signature(self.files)
+        self.dims = [self.weights[0].shape[1]] + [w.shape[0] for w in self.weights]
+        self.weights_float = [fixed_to_float(w, *q) for w, q in zip(self.weights, self.w_formats)]
+        self.biases_float = [fixed_to_float(b, *q) for b, q in zip(self.biases, self.b_formats)]
+
+        self.narrow = False
+        if self.a_format is not None:
+            n_a, x_a = self.a_format
+            f_a = n_a - x_a
+            self.f_prod = [f_a + n - x for n, x in self.w_formats]
+            self.f_b = [n - x for n, x in self.b_formats]
+            # Narrow engine when the headroom check proves it exact, else int64
+            try:
+                narrow_plan(self.weights, [align_bias(b, fb, fp) for b, fb, fp in
+                                           zip(self.biases, self.f_b, self.f_prod)], n_a)
+                self.narrow = True
+            except OverflowError as e:
+                print(f"Warning: {e}; using the int64 engine")
+
+    @property
+    def engine(self):
+        return "float" if self.a_format is None else "fixed"
+
+    def input_frac_bits(self):
+        """Default frac_bits of "fixed" samples."""
+        if self.a_format is not None:
+            return self.a_format[0] - self.a_format[1]
+        return self.w_formats[0][0] - self.w_formats[0][1]
+
+    def run(self, X, in_format, frac_bits, activations=False):
+        """(outputs, {layerN: values} or None) for one (N, in_dim) batch."""
+        layers = {} if activations else None
+        if self.a_format is None:
+            X = np.asarray(X, dtype=np.float64)
+            if in_format == "fixed":
+                X = X / (1 << frac_bits)
+            trace = (lambda l, values: layers.__setitem__(f"layer{l + 1}", values)) if activations else None
+            return forward(X, self.weights_float, self.biases_float, self.activations, trace), layers
+
+        n_a, x_a = self.a_format
+        if in_format == "float":
+            frac_bits = n_a - x_a
+            X = np.round(np.asarray(X, dtype=np.float64) * (1 << frac_bits)).astype(np.int64)
+        trace = None
+        if activations:
+            last = len(self.weights) - 1
+            def trace(l, point, values, rows):
+                if point == ("saturated" if l == last else "relu"):
+                    layers[f"layer{l + 1}"] = values
+        outputs = fixed_forward(np.asarray(X, dtype=np.int64), self.weights, self.biases, frac_bits,
+                                self.f_prod, self.f_b, n_a, x_a, trace=trace,
+                                narrow=self.narrow and trace is None)
+        return outputs, layers
+
+    def info(self):
+        return {"source": str(self.source), "engine": self.engine, "dims": self.dims,
+                "w_formats": self.w_formats, "b_formats": self.b_formats,
+                "a_format": self.a_format, "activations": self.activations, "narrow": self.narrow}
+
+def files_signature(files):
+    """(name, mtime_ns, size) of every file, to detect rewritten weights."""
+    signature = []
+    for f in files:
+        try:
+            st = os.stat(f)
+            signature.append((str(f), st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append((str(f), None, None))
+    return tuple(signature)
+
+# ---------- MICRO-BATCHING ----------
+class _Request:
+    __slots__ = ("X", "in_format", "frac_bits", "activations", "arrived", "done", "result", "error")
+
+    def __init__(self, X, in_format, frac_bits, activations):
+        self.X = X
+        self.in_format = in_format
+        self.frac_bits = frac_bits
+        self.activations = activations
+        self.arrived = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class MicroBatcher:
+    """
+    One worker thread draining a request queue. The first waiting request
+    opens a batch; requests arriving within max_delay (up to max_batch
+    samples) join it and run through the model as one GEMM per layer.
+    Requests are grouped by input format, so one call per group.
+    """
+
+    def __init__(self, loader, max_batch=MAX_BATCH, max_delay=MAX_DELAY, reload_check=RELOAD_CHECK):
+        self.loader = loader
+        self.model = loader()
+        self.version = 1
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.reload_check = reload_check
+        self.metrics = Metrics()
+        self._queue = deque()
+        self._queued_rows = 0
+        self._cond = threading.Condition()
+        self._next_check = time.monotonic() + reload_check
+        self._stop = False
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, X, in_format="float", frac_bits=None, activations=False):
+        """Blocks until the request has run; returns (outputs, activations, latency seconds)."""
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.ndim != 2 or X.shape[1] != self.model.dims[0]:
+            raise ValueError(f"expected samples of {self.model.dims[0]} values, got shape {X.shape}")
+        if frac_bits is None:
+            frac_bits = self.model.input_frac_bits()
+        request = _Request(X, in_format, frac_bits, activations)
+        with self._cond:
+            self._queue.append(request)
+            self._queued_rows += len(X)
+            self._cond.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        latency = time.perf_counter() - request.arrived
+        self.metrics.record(len(X), latency)
+        return request.result + (latency,)
+
+    def reload(self, force=True):
+        """Reloads the model if forced or its files changed. Returns True if swapped."""
+        if not force and files_signature(self.model.files) == self.model.signature:
+            return False
+        model = self.loader()   # raises (old model kept) if the files are half written
+        with self._cond:
+            self.model = model
+            self.version += 1
+        return True
+
+    def close(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _take_batch(self):
+        with self._cond:
+            if not self._queue and not self._stop:
+                self._cond.wait(timeout=self.reload_check)
+            if not self._queue or self._stop:
+                return []
+            # Hold the batch open until max_delay after its first request or max_batch samples
+            deadline = self._queue[0].arrived + self.max_delay
+            while self._queued_rows < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(timeout=remaining)
+            batch = [self._queue.popleft()]     # an oversized request still runs, alone
+            rows = len(batch[0].X)
+            while self._queue and rows + len(self._queue[0].X) <= self.max_batch:
+                batch.append(self._queue.popleft())
+                rows += len(batch[-1].X)
+            self._queued_rows -= rows
+            return batch
+
+    def _loop(self):
+        while not self._stop:
+            if time.monotonic() >= self._next_check:
+                self._next_check = time.monotonic() + self.reload_check
+                try:
+                    self.reload(force=False)
+                except Exception as e:
+                    print(f"Warning: reload of {self.model.source} failed ({e}); keeping version {self.version}")
+            batch = self._take_batch()
+            if batch:
+                self._run(batch)
+
+    def _run(self, batch):
+        model = self.model
+        groups = {}
+        for request in batch:
+            groups.setdefault((request.in_format, request.frac_bits), []).append(request)
+        for (in_format, frac_bits), requests in groups.items():
+            try:
+                X = np.concatenate([r.X for r in requests])
+                outputs, layers = model.run(X, in_format, frac_bits, any(r.activations for r in requests))
+                start = 0
+                for r in requests:
+                    stop = start + len(r.X)
+                    acts = {k: v[start:stop] for k, v in layers.items()} if r.activations else None
+                    r.result = (outputs[start:stop], acts)
+                    start = stop
+            except Exception as e:
+                for r in requests:
+                    r.error = e
+            for r in requests:
+                r.done.set()
+        self.metrics.record_batch(sum(len(r.X) for r in batch))
+
+# ---------- METRICS ----------
+class Metrics:
+    """Request, sample and batch counters plus a window of recent latencies."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.samples = 0
+        self.batches = 0
+        self.batched_samples = 0
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, samples, latency):
+        with self._lock:
+            self.requests += 1
+            self.samples += samples
+            self.latencies.append(latency)
+
+    def record_batch(self, samples):
+        with self._lock:
+            self.batches += 1
+            self.batched_samples += samples
+
+    def snapshot(self):
+        with self._lock:
+            uptime = time.monotonic() - self.started
+            latencies = np.array(self.latencies) * 1000
+            result = {"uptime_s": uptime, "requests": self.requests, "samples": self.samples,
+                      "batches": self.batches,
+                      "mean_batch_samples": self.batched_samples / self.batches if self.batches else 0.0,
+                      "samples_per_s": self.samples / uptime if uptime > 0 else 0.0,
+                      "requests_per_s": self.requests / uptime if uptime > 0 else 0.0}
+        if len(latencies):
+            for p in (50, 95, 99):
+                result[f"latency_p{p}_ms"] = float(np.percentile(latencies, p))
+            result["latency_max_ms"] = float(latencies.max())
+        return result
+
+# ---------- HTTP ----------
+class InferenceHandler(BaseHTTPRequestHandler):
+    """JSON endpoints of the server; self.server.batcher is the MicroBatcher."""
+
+    protocol_version = "HTTP/1.1"   # keep-alive, so clients reuse one connection
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        pass    # per-request lines would dominate; see /metrics
+
+    def _reply(self, code, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        batcher = self.server.batcher
+        if self.path == "/metrics":
+            self._reply(200, dict(batcher.metrics.snapshot(), model_version=batcher.version))
+        elif self.path == "/model":
+            self._reply(200, dict(batcher.model.info(), version=batcher.version))
+        else:
+            self._reply(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        batcher = self.server.batcher
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/predict":
+                in_format = request.get("format", "float")
+                if in_format not in ("float", "fixed"):
+                    raise ValueError(f"format must be 'float' or 'fixed', got {in_format!r}")
+                outputs, layers, latency = batcher.submit(
+                    request["samples"], in_format, request.get("frac_bits"), bool(request.get("activations")))
+                reply = {"predictions": np.argmax(outputs, axis=1).tolist(), "outputs": outputs.tolist(),
+                         "latency_ms": latency * 1000, "model_version": batcher.version}
+                if layers is not None:
+                    reply["activations"] = {k: v.tolist() for k, v in layers.items()}
+                self._reply(200, reply)
+            elif self.path == "/reload":
+                batcher.reload(force=True)
+                self._reply(200, {"model_version": batcher.version})
+            else:
+                self._reply(404, {"error": f"unknown path {self.path}"})
+        except (ValueError, KeyError, TypeError, OverflowError) as e:
+            self._reply(400, {"error": f"{type(e).__name__}: {e}"})
+        except Exception as e:
+            self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def make_server(batcher, port=DEFAULT_PORT, unix_socket=None):
+    """HTTP server on 127.0.0.1:port, or on the Unix socket path if given."""
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = ThreadingUnixHTTPServer(str(unix_socket), InferenceHandler)
+    else:
+        server = ThreadingHTTPServer(("127.0.0.1", port), InferenceHandler)
+        server.daemon_threads = True
+    server.batcher = batcher
+    return server
+
+# ---------- CLIENT ----------
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.unix_path)
+
+class InferenceClient:
+    """
+    Keep-alive client for the server:
+
+        client = InferenceClient(unix_socket="/tmp/ann.sock")
+        reply = client.predict(X_float)               # or format="fixed", frac_bits=16
+        reply["predictions"], reply["outputs"]
+    """
+
+    def __init__(self, port=DEFAULT_PORT, unix_socket=None, timeout=60):
+        if unix_socket is not None:
+            self.conn = _UnixHTTPConnection(str(unix_socket), timeout=timeout)
+        else:
+            self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+
+    def _call(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        self.conn.request(method, path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        reply = json.loads(response.read())
+        if response.status != 200:
+            raise RuntimeError(f"{method} {path}: {response.status} {reply.get('error')}")
+        return reply
+
+    def predict(self, samples, format="float", frac_bits=None, activations=False):
+        payload = {"samples": np.asarray(samples).tolist(), "format": format, "activations": activations}
+        if frac_bits is not None:
+            payload["frac_bits"] = frac_bits
+        return self._call("POST", "/predict", payload)
+
+    def metrics(self):
+        return self._call("GET", "/metrics")
+
+    def model(self):
+        return self._call("GET", "/model")
+
+    def reload(self):
+        return self._call("POST", "/reload")
+
+    def close(self):
+        self.conn.close()
+
+# ---------- COMMAND LINE ----------
+# python -m ann_sw.inference_server model.annb                        [options]
+# python -m ann_sw.inference_server "Best - booth" W_N W_X B_N B_X    [options]
+# options: --fixed N_A X_A (bit-exact integer engine) --port PORT --socket PATH
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {}
+    for name, count in (("--fixed", 2), ("--port", 1), ("--socket", 1)):
+        if name in args:
+            i = args.index(name)
+            options[name] = args[i + 1:i + 1 + count]
+            del args[i:i + 1 + count]
+    if len(args) not in (1, 5):
+        print("Usage: python -m ann_sw.inference_server BUNDLE | DIR W_N W_X B_N B_X "
+              "[--fixed N_A X_A] [--port PORT | --socket PATH]")
+        sys.exit(1)
+    w_q = (int(args[1]), int(args[2])) if len(args) == 5 else None
+    b_q = (int(args[3]), int(args[4])) if len(args) == 5 else None
+    a_q = tuple(int(v) for v in options["--fixed"]) if "--fixed" in options else None
+    batcher = MicroBatcher(lambda: ServedModel(args[0], w_q, b_q, a_q))
+    unix_socket = options["--socket"][0] if "--socket" in options else None
+    port = int(options["--port"][0]) if "--port" in options else DEFAULT_PORT
+    server = make_server(batcher, port, unix_socket)
+    print(f"Serving {batcher.model.source} ({batcher.model.engine} engine, dims {batcher.model.dims}) "
+          f"on {unix_socket or f'http://127.0.0.1:{port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+        if unix_socket is not None and os.path.exists(unix_socket):
+            os.remove(unix_socket)
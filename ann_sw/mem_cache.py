@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from ann_sw.mem_decode import load_mem_dataset, load_mem_params
+from ann_sw.mem_hex import resolve_format
+
+# ---------- PARAMETERS ----------
+# Decoded arrays live in one directory per (source file, Q-format) key:
+#   <cache_dir>/<key>/fixed.npy, float.npy, labels.npy, meta.json
+# ANN_SW_CACHE_DIR / ANN_SW_CACHE_MAX_BYTES override the defaults.
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "ann_sw"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+HASH_BLOCK = 1024 * 1024
+
+def cache_dir_path(cache_dir=None):
+    if cache_dir is not None:
+        return Path(cache_dir)
+    return Path(os.environ.get("ANN_SW_CACHE_DIR", DEFAULT_CACHE_DIR))
+
+def cache_max_bytes(max_bytes=None):
+    if max_bytes is not None:
+        return int(max_bytes)
+    return int(os.environ.get("ANN_SW_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+
+# ---------- KEYING ----------
+def file_fingerprint(filename, content_hash=False):
+    """
+    Identifies the current contents of filename.
+
+    By default this is (absolute path, size, mtime_ns), which costs one stat().
+    With content_hash=True the file is SHA-1 hashed instead, so copies and
+    touched-but-unchanged files still hit the cache.
+    """
+    if content_hash:
+        h = hashlib.sha1()
+        with open(filename, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK), b""):
+                h.update(block)
+        return {"sha1": h.hexdigest()}
+    st = os.stat(filename)
+    return {"path": str(Path(filename).resolve()), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def cache_key(kind, filename, layout, content_hash=False):
+    """Hex key over the source fingerprint, the loader kind and the Q-format/layout."""
+    payload = {"kind": kind, "source": file_fingerprint(filename, content_hash), "format": layout}
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+# ---------- STORE / LOAD ----------
+def _entry_size(entry):
+    return sum(p.stat().st_size for p in entry.iterdir() if p.is_file())
+
+def _load_entry(entry, names):
+    arrays = tuple(np.load(entry / f"{name}.npy", mmap_mode="r") for name in names)
+    os.utime(entry)  # mark as recently used for eviction
+    return arrays
+
+def _store_entry(root, key, names, arrays, meta):
+    root.mkdir(parents=True, exist_ok=True)
+    tmp = root / f".{key}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+    for name, arr in zip(names, arrays):
+        np.save(tmp / f"{name}.npy", np.ascontiguousarray(arr))
+    (tmp / "meta.json").write_text(json.dumps(meta, sort_keys=True))
+    entry = root / key
+    try:
+        os.replace(tmp, entry)
+    except OSError:
+        # Another process stored the same key first; keep theirs.
+        shutil.rmtree(tmp, ignore_errors=True)
+    return entry
+
+def evict(cache_dir=None, max_bytes=None):
+    """
+    Drops least-recently-used entries until the cache fits in max_bytes.
+    Returns the number of entries removed.
+    """
+    root = cache_dir_path(cache_dir)
+    limit = cache_max_bytes(max_bytes)
+    if not root.is_dir():
+        return 0
+    entries = [(e.stat().st_mtime, _entry_size(e), e) for e in root.iterdir()
+               if e.is_dir() and not e.name.startswith(".")]
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, entry in sorted(entries, key=lambda t: t[0]):
+        if total <= limit:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        removed += 1
+    return removed
+
+def _cached(kind, filename, layout, names, loader, cache_dir, max_bytes, content_hash):
+    root = cache_dir_path(cache_dir)
+    key = cache_key(kind, filename, layout, content_hash)
+    entry = root / key
+    if (entry / "meta.json").exists():
+        try:
+            return _load_entry(entry, names)
+        except (OSError, ValueError):
+            shutil.rmtree(entry, ignore_errors=True)
+
+    arrays = loader()
+    meta = {"kind": kind, "source": str(filename), "format": layout}
+    entry = _store_entry(root, key, names, arrays, meta)
+    evict(root, max_bytes)
+    if (entry / "meta.json").exists():
+        return _load_entry(entry, names)
+    return arrays
+
+# ---------- CACHED LOADERS ----------
+def cached_load_mem_dataset(filename, n, x, num_features=None, label_bits=4, fmt="auto",
+                            cache_dir=None, max_bytes=None, content_hash=False):
+    """
+    load_mem_dataset() backed by the on-disk cache.
+
+    The first call decodes the text file and saves the arrays as .npy; later
+    calls with the same file contents and (n, x, num_features, label_bits, fmt)
+    return read-only memory-mapped arrays without parsing anything.
+    """
+    layout = {"n": n, "x": x, "num_features": num_features, "label_bits": label_bits,
+              "fmt": resolve_format(filename, fmt)}
+    return _cached("dataset", filename, layout, ("fixed", "float", "labels"),
+                   lambda: load_mem_dataset(filename, n, x, num_features, label_bits, fmt),
+                   cache_dir, max_bytes, content_hash)
+
+def cached_load_mem_params(filename, n, x, num_fields=None, fmt="auto",
+                           cache_dir=None, max_bytes=None, content_hash=False):
+    """load_mem_params() backed by the on-disk cache. Returns (fixed, floats)."""
+    layout = {"n": n, "x": x, "num_fields": num_fields, "fmt": resolve_format(filename, fmt)}
+    return _cached("params", filename, layout, ("fixed", "float"),
+                   lambda: load_mem_params(filename, n, x, num_fields, fmt),
+                   cache_dir, max_bytes, content_hash)
+
+# ---------- MAINTENANCE ----------
+def cache_info(cache_dir=None):
+    """List of (key, size in bytes, meta dict) for every cached entry."""
+    root = cache_dir_path(cache_dir)
+    if not root.is_dir():
+        return []
+    info = []
+    for entry in sorted(root.iterdir()):
+        if entry.is_dir() and not entry.name.startswith("."):
+            meta_file = entry / "meta.json"
+            meta = json.loads(meta_file.read_text()) if meta_file.exists() else {}
+            info.append((entry.name, _entry_size(entry), meta))
+    return info
+
+def clear_cache(cache_dir=None):
+    """Removes every cached entry. Returns the number of entries removed."""
+    root = cache_dir_path(cache_dir)
+    if not root.is_dir():
+        return 0
+    count = 0
+    for entry in root.iterdir():
+        if entry.is_dir():
+            shutil.rmtree(entry, ignore_errors=True)
+            count += 1
+    return count
+
+# ---------- COMMAND LINE ----------
+# python -m ann_sw.mem_cache info | clear | evict [max_bytes]
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "info"
+    if command == "clear":
+        print(f"Removed {clear_cache()} cache entries from {cache_dir_path()}")
+    elif command == "evict":
+        limit = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        print(f"Evicted {evict(max_bytes=limit)} cache entries")
+    elif command == "info":
+        entries = cache_info()
+        for key, size, meta in entries:
+            print(f"{key[:12]}  {size / 1e6:8.2f} MB  {meta.get('kind', '?'):8s} "
+                  f"{meta.get('source', '?')}  {meta.get('format', {})}")
+        total = sum(size for _, size, _ in entries)
+        print(f"{len(entries)} entries, {total / 1e6:.2f} MB in {cache_dir_path()}")
+    else:
+        print("Usage: python -m ann_sw.mem_cache [info | clear | evict [max_bytes]]")
+        sys.exit(1)
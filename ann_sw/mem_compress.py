@@ -0,0 +1,97 @@
+import gzip
+import lzma
+import os
+import shutil
+import sys
+
+# ---------- PARAMETERS ----------
+# Dataset files are long runs of '0'/'1' (or hex digits) and compress very
+# well. Any reader or writer in ann_sw accepts "<name>.gz" / "<name>.xz" and
+# goes through the stdlib codecs; the .mem/.hex part of the name underneath
+# still decides bin vs hex. Simulators need the plain text, so
+# decompress_mem() writes an uncompressed copy on demand.
+GZIP_LEVEL = 6          # gzip.open() defaults to 9, which is much slower for little gain here
+XZ_PRESET = 6
+COPY_BLOCK = 16 * 1024 * 1024
+
+COMPRESSED_SUFFIXES = (".gz", ".xz")
+
+def compression_of(filename):
+    """'.gz', '.xz' or None, from the file name."""
+    name = str(filename).lower()
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.endswith(suffix):
+            return suffix
+    return None
+
+def strip_compression(filename):
+    """filename without a trailing .gz/.xz, e.g. 'train_bin.txt.xz' -> 'train_bin.txt'."""
+    suffix = compression_of(filename)
+    return str(filename)[:-len(suffix)] if suffix else str(filename)
+
+def open_mem(filename, mode="rb", compression="auto"):
+    """
+    open() that transparently (de)compresses .gz/.xz files.
+
+    compression='auto' picks the codec from the file name; pass '.gz', '.xz'
+    or None to force one, e.g. for shard files with a different suffix.
+    Text modes are supported as with gzip.open()/lzma.open().
+    """
+    if compression == "auto":
+        compression = compression_of(filename)
+    writing = any(c in mode for c in "wax")
+    if compression == ".gz":
+        return gzip.open(filename, mode, compresslevel=GZIP_LEVEL) if writing else gzip.open(filename, mode)
+    if compression == ".xz":
+        return lzma.open(filename, mode, preset=XZ_PRESET) if writing else lzma.open(filename, mode)
+    if compression is not None:
+        raise ValueError(f"Unknown compression '{compression}', expected '.gz', '.xz' or None")
+    return open(filename, mode)
+
+def read_mem_bytes(filename):
+    """Whole (decompressed) file contents as bytes."""
+    with open_mem(filename, "rb") as f:
+        return f.read()
+
+# ---------- CONVERSION ----------
+def _copy(src, dst, src_compression, dst_compression):
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    with open_mem(src, "rb", src_compression) as fin, open_mem(tmp, "wb", dst_compression) as fout:
+        shutil.copyfileobj(fin, fout, COPY_BLOCK)
+    os.replace(tmp, dst)
+    return dst
+
+def decompress_mem(filename, out_filename=None, force=False):
+    """
+    Writes the uncompressed copy of a .gz/.xz file for the simulator and
+    returns its path (default: the name without the suffix). An existing copy
+    newer than the source is reused unless force=True. Plain files are
+    returned unchanged.
+    """
+    if compression_of(filename) is None:
+        return str(filename)
+    out_filename = strip_compression(filename) if out_filename is None else str(out_filename)
+    if not force and os.path.exists(out_filename) \
+            and os.path.getmtime(out_filename) >= os.path.getmtime(filename):
+        return out_filename
+    return _copy(filename, out_filename, "auto", None)
+
+def compress_mem(filename, compression=".xz", out_filename=None):
+    """Writes filename + compression (or out_filename) and returns its path."""
+    out_filename = str(filename) + compression if out_filename is None else str(out_filename)
+    return _copy(filename, out_filename, "auto", compression)
+
+# ---------- COMMAND LINE ----------
+# python -m ann_sw.mem_compress compress   train_bin.txt [.gz|.xz]
+# python -m ann_sw.mem_compress decompress train_bin.txt.xz [train_bin.txt]
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) in (2, 3) and args[0] == "compress":
+        out = compress_mem(args[1], args[2] if len(args) == 3 else ".xz")
+    elif len(args) in (2, 3) and args[0] == "decompress":
+        out = decompress_mem(args[1], args[2] if len(args) == 3 else None, force=True)
+    else:
+        print("Usage: python -m ann_sw.mem_compress compress FILE [.gz|.xz] | decompress FILE [OUT]")
+        sys.exit(1)
+    in_size, out_size = os.path.getsize(args[1]), os.path.getsize(out)
+    print(f"{args[1]} ({in_size / 1e6:.2f} MB) -> {out} ({out_size / 1e6:.2f} MB)")
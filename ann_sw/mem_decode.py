@@ -0,0 +1,159 @@
+import numpy as np
+
+from ann_sw.mem_compress import compression_of, read_mem_bytes
+from ann_sw.mem_hex import hex_chars_to_bits, resolve_format
+
+NEWLINE = ord('\n')
+CARRIAGE_RETURN = ord('\r')
+ZERO = ord('0')
+
+# Size of the temporary widened bit block used per dot product.
+CHUNK_BYTES = 64 * 1024 * 1024
+
+# ---------- BIT-LEVEL HELPERS ----------
+def bit_weights(n, signed=True):
+    """
+    Place values of an n-bit MSB-first field as int64.
+
+    For signed fields the MSB weight is -2^(n-1), so a dot product with the
+    bits gives the two's complement value directly.
+    """
+    msb = -(1 << (n - 1)) if signed else 1 << (n - 1)
+    return np.array([msb] + [1 << i for i in range(n - 2, -1, -1)], dtype=np.int64)
+
+def _dot_dtype(n):
+    """Narrowest dtype whose dot product is exact for n-bit fields (BLAS for floats)."""
+    if n <= 24:
+        return np.float32
+    if n <= 53:
+        return np.float64
+    return np.int64
+
+def bits_to_fixed(bits, n, signed=True):
+    """
+    Reduces (rows, k * n) 0/1 bits to (rows, k) integers with one dot product
+    against the bit weights. Rows are processed in blocks so the widened copy
+    of the bits stays around CHUNK_BYTES.
+    """
+    bits = np.asarray(bits)
+    rows, width = bits.shape
+    k = width // n
+    dtype = _dot_dtype(n)
+    weights = bit_weights(n, signed).astype(dtype)
+    out = np.empty((rows, k), dtype=np.int64)
+    block = max(1, CHUNK_BYTES // max(1, width * np.dtype(dtype).itemsize))
+    for start in range(0, rows, block):
+        chunk = bits[start:start + block, :k * n].reshape(-1, k, n)
+        out[start:start + block] = chunk.astype(dtype) @ weights
+    return out
+
+def fixed_to_float(fixed, n, x):
+    """Dequantizes Q(x, n-x) integers to float64."""
+    return np.asarray(fixed, dtype=np.float64) / (2 ** (n - x))
+
+# ---------- FILE READING ----------
+def _rows_from_ragged(data, filename):
+    """Slow path for files with blank lines or trailing spaces."""
+    lines = bytes(data).split()
+    if not lines:
+        return np.zeros((0, 0), dtype=np.uint8)
+    width = len(lines[0])
+    for i, line in enumerate(lines):
+        if len(line) != width:
+            raise ValueError(f"{filename}: line {i} has {len(line)} chars, expected {width}")
+    return np.frombuffer(b''.join(lines), dtype=np.uint8).reshape(len(lines), width)
+
+def read_mem_chars(filename):
+    """
+    Reads a $readmemb/$readmemh text file as a (rows, line_length) uint8
+    array of ASCII.
+
+    Fixed-width files are viewed in place without splitting into Python
+    strings; files with CRLF endings, blank lines or stray whitespace fall
+    back to a bytes.split() pass. .gz/.xz files are decompressed in memory.
+    """
+    if compression_of(filename):
+        data = np.frombuffer(read_mem_bytes(filename), dtype=np.uint8)
+    else:
+        data = np.fromfile(filename, dtype=np.uint8)
+    if data.size == 0:
+        return np.zeros((0, 0), dtype=np.uint8)
+    if data[-1] != NEWLINE:
+        data = np.append(data, np.uint8(NEWLINE))
+
+    newlines = np.flatnonzero(data == NEWLINE)
+    width = int(newlines[0])
+    if data.size % (width + 1) == 0 and np.all(np.diff(newlines) == width + 1) \
+            and not np.any(data == CARRIAGE_RETURN):
+        return data.reshape(-1, width + 1)[:, :width]
+    return _rows_from_ragged(data, filename)
+
+def _bin_chars_to_bits(chars, filename):
+    bits = chars - np.uint8(ZERO)
+    if bits.size and bits.max() > 1:
+        raise ValueError(f"{filename}: non-binary characters found")
+    return bits
+
+def read_mem_bits(filename, fmt="auto", width=None):
+    """
+    (rows, line_length) array of 0/1 bits from a $readmemb or $readmemh file.
+
+    Hex lines are expanded to `width` bits (default: 4 bits per digit),
+    dropping the zero padding on the MSB side.
+    """
+    chars = read_mem_chars(filename)
+    if resolve_format(filename, fmt) == "hex":
+        return hex_chars_to_bits(chars, 4 * chars.shape[1] if width is None else width)
+    return _bin_chars_to_bits(chars, filename)
+
+def _read_fields(filename, fmt, n, num_fields, extra_bits):
+    """
+    Bits of a file holding num_fields n-bit values plus extra_bits per line.
+    Returns (bits, num_fields), inferring num_fields from the line width.
+    """
+    chars = read_mem_chars(filename)
+    if resolve_format(filename, fmt) == "hex":
+        if num_fields is None:
+            num_fields = (4 * chars.shape[1] - extra_bits) // n
+        bits = hex_chars_to_bits(chars, num_fields * n + extra_bits)
+    else:
+        bits = _bin_chars_to_bits(chars, filename)
+        if num_fields is None:
+            num_fields = (bits.shape[1] - extra_bits) // n
+    return bits, num_fields
+
+# ---------- DATASET / PARAMETER LOADERS ----------
+def load_mem_dataset(filename, n, x, num_features=None, label_bits=4, fmt="auto"):
+    """
+    Decodes a dataset .mem file (features followed by a label on each line).
+    fmt is 'bin', 'hex' or 'auto' (hex for .hex/.memh files).
+
+    Returns (X_fixed, X_float, y):
+        X_fixed: (rows, num_features) int64 two's complement values
+        X_float: (rows, num_features) float32 dequantized Q(x, n-x) values
+        y:       (rows,) int32 unsigned labels from the last label_bits bits
+    """
+    bits, num_features = _read_fields(filename, fmt, n, num_features, label_bits)
+    expected = num_features * n + label_bits
+    if bits.shape[1] < expected:
+        raise ValueError(f"{filename}: line length {bits.shape[1]} less than expected {expected}")
+
+    X_fixed = bits_to_fixed(bits[:, :num_features * n], n)
+    label_start = num_features * n
+    y = bits_to_fixed(bits[:, label_start:label_start + label_bits], label_bits, signed=False)
+    X_float = fixed_to_float(X_fixed, n, x).astype(np.float32)
+    return X_fixed, X_float, y[:, 0].astype(np.int32)
+
+def load_mem_params(filename, n, x, num_fields=None, fmt="auto"):
+    """
+    Decodes a weight or bias .mem file with num_fields n-bit values per line.
+
+    Weight files give (out_dim, in_dim) arrays, bias files (out_dim, 1);
+    callers squeeze biases with [:, 0]. Returns (fixed, floats).
+    """
+    bits, num_fields = _read_fields(filename, fmt, n, num_fields, 0)
+    expected = num_fields * n
+    if bits.shape[1] < expected:
+        raise ValueError(f"{filename}: line length {bits.shape[1]} less than expected {expected}")
+    fixed = bits_to_fixed(bits[:, :num_fields * n], n)
+    return fixed, fixed_to_float(fixed, n, x)
@@ -0,0 +1,123 @@
+import numpy as np
+
+from ann_sw.fixed_point import quantize
+from ann_sw.mem_compress import open_mem
+from ann_sw.mem_hex import bit_chars_to_hex_chars, hex_width, resolve_format
+
+# ---------- PARAMETERS ----------
+# Rows written per f.write() call. Each chunk is encoded as one uint8 block,
+# so peak memory is chunk_rows * line_length bytes instead of the whole file.
+CHUNK_BYTES = 16 * 1024 * 1024
+
+NEWLINE = ord('\n')
+ZERO = ord('0')
+
+# ---------- FIXED-POINT QUANTIZATION ----------
+def quantize_to_fixed(values, n, x, scale=1.0):
+    """
+    Vectorized float -> signed fixed-point integer conversion.
+
+    values are divided by `scale` (255.0 normalizes pixels to [0, 1]), scaled
+    by 2^(n-x), rounded with np.round (ties to even, same as Python round())
+    and clamped to the n-bit two's complement range: fixed_point.quantize()
+    with half_even rounding.
+    Returns an int64 array of the same shape as values.
+    """
+    return quantize(values, n, x, "half_even", scale)
+
+def fixed_to_bit_chars(fixed, n):
+    """
+    Two's complement bit-unpacking of an integer array.
+
+    fixed has shape (..., k). Returns a uint8 array of ASCII '0'/'1' with
+    shape (..., k * n), MSB first, ready to be written as $readmemb text.
+    """
+    fixed = np.asarray(fixed, dtype=np.int64)
+    masked = fixed & np.int64((1 << n) - 1) if n < 64 else fixed
+    # Big-endian 64-bit bytes -> 64 bits per value, keep the low n.
+    as_bytes = masked.astype('>u8').view(np.uint8).reshape(fixed.shape + (8,))
+    bits = np.unpackbits(as_bytes, axis=-1)[..., 64 - n:]
+    return bits.reshape(fixed.shape[:-1] + (fixed.shape[-1] * n,)) + np.uint8(ZERO)
+
+# ---------- LINE ENCODING ----------
+def encode_dataset_lines(X, Y, n, x, label_bits=4, scale=255.0, fmt="bin"):
+    """
+    Encodes a batch of images and labels into .mem lines.
+
+    X is (N, ...) pixels, Y is (N,) labels. Every pixel becomes an n-bit Q(x, n-x)
+    field, followed by a label_bits unsigned label and a newline.
+    Returns a (N, pixels * n + label_bits + 1) uint8 array for fmt='bin', or
+    the same line as ceil(bits / 4) hex digits for fmt='hex' ($readmemh).
+    """
+    X = np.asarray(X)
+    flat = X.reshape(len(X), -1)
+    pixels = fixed_to_bit_chars(quantize_to_fixed(flat, n, x, scale), n)
+    labels = fixed_to_bit_chars(np.asarray(Y, dtype=np.int64).reshape(-1, 1), label_bits)
+    line = np.concatenate([pixels, labels], axis=1)
+    if fmt == "hex":
+        line = bit_chars_to_hex_chars(line)
+    newline = np.full((len(X), 1), NEWLINE, dtype=np.uint8)
+    return np.concatenate([line, newline], axis=1)
+
+def write_mem_dataset(X, Y, filename, n, x, label_bits=4, scale=255.0, chunk_rows=None, fmt="auto"):
+    """
+    Writes X/Y to a $readmemb dataset file, one sample per line.
+
+    Output is byte-identical to the per-pixel pixel_to_q88_bin() loop in
+    input_88.py, but every chunk of rows is quantized and bit-unpacked as one
+    array and written with a single buffered f.write(). fmt='hex' (or 'auto'
+    with a .hex filename) writes $readmemh lines instead, and a .gz/.xz suffix
+    compresses the output as it is written.
+    """
+    fmt = resolve_format(filename, fmt)
+    X = np.asarray(X)
+    Y = np.asarray(Y)
+    line_length = X[0].size * n + label_bits + 1 if len(X) else 1
+    if chunk_rows is None:
+        chunk_rows = max(1, CHUNK_BYTES // line_length)
+
+    with open_mem(filename, 'wb') as f:
+        for start in range(0, len(X), chunk_rows):
+            stop = start + chunk_rows
+            block = encode_dataset_lines(X[start:stop], Y[start:stop], n, x, label_bits, scale, fmt)
+            f.write(block.tobytes())
+
+# ---------- WEIGHT & BIAS FILES ----------
+def encode_param_lines(values, n, x, fmt="bin"):
+    """
+    Encodes a weight matrix or bias vector into .mem lines.
+
+    values is (out_dim, in_dim), giving one line of in_dim n-bit Q(x, n-x)
+    fields per output neuron, or (out_dim,), giving one field per line as in
+    the bias files. Values are rounded and saturated like quantize_to_fixed().
+    The lines are filled into one preallocated (rows, width + 1) uint8 buffer,
+    newline included, ready for a single f.write().
+    """
+    fixed = quantize_to_fixed(values, n, x)
+    if fixed.ndim == 1:
+        fixed = fixed[:, None]
+    width = fixed.shape[1] * n
+    if fmt == "hex":
+        width = hex_width(width)
+    lines = np.empty((fixed.shape[0], width + 1), dtype=np.uint8)
+    bits = fixed_to_bit_chars(fixed, n)
+    lines[:, :width] = bit_chars_to_hex_chars(bits) if fmt == "hex" else bits
+    lines[:, width] = NEWLINE
+    return lines
+
+def write_mem_params(values, filename, n, x, fmt="auto"):
+    """
+    Writes a weight matrix (out_dim, in_dim) or bias vector (out_dim,) as a
+    .mem file, the counterpart of ann_sw.mem_decode.load_mem_params().
+
+    Output is byte-identical to the per-value round() + format() exporters
+    the training scripts used to carry: round half to even, saturate to n bits, two's complement, MSB first,
+    to_mem_line() hex for fmt='hex'. Raises ValueError on NaN, which the
+    scalar exporters cannot convert either.
+    """
+    values = np.asarray(values)
+    if np.isnan(values).any():
+        raise ValueError(f"{filename}: NaN values cannot be converted to Q({n},{x})")
+    lines = encode_param_lines(values, n, x, resolve_format(filename, fmt))
+    with open_mem(filename, 'wb') as f:
+        f.write(lines.tobytes())
@@ -0,0 +1,125 @@
+import sys
+
+import numpy as np
+
+from ann_sw.mem_compress import open_mem, strip_compression
+
+# ---------- PARAMETERS ----------
+# $readmemh reads each line as one word, right-aligned into the memory width.
+# A W-bit $readmemb line therefore becomes ceil(W/4) hex digits with the
+# (-W) % 4 padding bits added as zeros on the MSB side. This is what makes
+# 11-bit pixels, 22-bit biases or 8628-bit MNIST lines load to the same
+# values with either system task.
+HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+ZERO = ord('0')
+
+# ASCII -> nibble value, 255 marks characters that are not hex digits.
+_NIBBLE = np.full(256, 255, dtype=np.uint8)
+_NIBBLE[np.frombuffer(b"0123456789", dtype=np.uint8)] = np.arange(10)
+_NIBBLE[np.frombuffer(b"abcdef", dtype=np.uint8)] = np.arange(10, 16)
+_NIBBLE[np.frombuffer(b"ABCDEF", dtype=np.uint8)] = np.arange(10, 16)
+
+def hex_width(width):
+    """Number of hex digits needed for a width-bit line."""
+    return (width + 3) // 4
+
+def is_hex_path(filename):
+    return strip_compression(filename).lower().endswith((".hex", ".memh"))
+
+def resolve_format(filename, fmt="auto"):
+    """'bin' or 'hex'; 'auto' picks hex for .hex/.memh files (also .hex.gz etc.)."""
+    if fmt == "auto":
+        return "hex" if is_hex_path(filename) else "bin"
+    if fmt not in ("bin", "hex"):
+        raise ValueError(f"Unknown .mem format '{fmt}', expected 'bin', 'hex' or 'auto'")
+    return fmt
+
+# ---------- ARRAY CONVERSION ----------
+def bit_chars_to_hex_chars(chars):
+    """(rows, W) ASCII '0'/'1' -> (rows, ceil(W/4)) ASCII lowercase hex."""
+    chars = np.asarray(chars)
+    rows, width = chars.shape
+    pad = (-width) % 4
+    bits = np.zeros((rows, width + pad), dtype=np.uint8)
+    bits[:, pad:] = chars - np.uint8(ZERO)
+    nibbles = bits.reshape(rows, (width + pad) // 4, 4) @ np.array([8, 4, 2, 1], dtype=np.uint8)
+    return HEX_DIGITS[nibbles]
+
+def hex_chars_to_bits(chars, width):
+    """
+    (rows, H) ASCII hex -> (rows, width) 0/1 bits, dropping the 4H - width
+    MSB padding bits. Raises if padding bits are set or non-hex digits appear.
+    """
+    chars = np.asarray(chars)
+    nibbles = _NIBBLE[chars]
+    if nibbles.size and nibbles.max() == 255:
+        raise ValueError("non-hex characters found")
+    bits = np.unpackbits(nibbles[..., None], axis=-1)[..., 4:]
+    bits = bits.reshape(chars.shape[0], -1)
+    pad = bits.shape[1] - width
+    if pad < 0 or pad >= 4:
+        raise ValueError(f"{chars.shape[1]} hex digits cannot hold a {width}-bit line")
+    if pad and bits[:, :pad].any():
+        raise ValueError(f"padding bits set in a {width}-bit hex line")
+    return bits[:, pad:]
+
+def bin_str_to_hex(bin_str):
+    """Scalar version for the per-row exporters: '0101...' -> zero-padded hex string."""
+    return format(int(bin_str, 2), f"0{hex_width(len(bin_str))}x")
+
+def to_mem_line(bin_str, fmt="bin"):
+    """Returns bin_str unchanged for 'bin', or its $readmemh form for 'hex'."""
+    return bin_str_to_hex(bin_str) if fmt == "hex" else bin_str
+
+# ---------- FILE CONVERSION ----------
+def _write_lines(chars, filename):
+    newline = np.full((chars.shape[0], 1), ord('\n'), dtype=np.uint8)
+    with open_mem(filename, "wb") as f:
+        f.write(np.concatenate([chars, newline], axis=1).tobytes())
+
+def bin_file_to_hex(bin_filename, hex_filename):
+    """Converts a $readmemb file into the equivalent $readmemh file."""
+    from ann_sw.mem_decode import read_mem_chars
+    _write_lines(bit_chars_to_hex_chars(read_mem_chars(bin_filename)), hex_filename)
+
+def hex_file_to_bin(hex_filename, bin_filename, width):
+    """Converts a $readmemh file back to width-bit $readmemb lines."""
+    from ann_sw.mem_decode import read_mem_chars
+    bits = hex_chars_to_bits(read_mem_chars(hex_filename), width)
+    _write_lines(bits + np.uint8(ZERO), bin_filename)
+
+def check_roundtrip(bin_filename, hex_filename=None):
+    """
+    Round-trip check of the hex mode against a binary file.
+
+    Converts bin -> hex (into hex_filename if given, else in memory) -> bits
+    and compares with the original bits. Returns (ok, binary bytes, hex bytes).
+    """
+    from ann_sw.mem_decode import read_mem_chars
+    chars = read_mem_chars(bin_filename)
+    hex_chars = bit_chars_to_hex_chars(chars)
+    if hex_filename is not None:
+        _write_lines(hex_chars, hex_filename)
+        hex_chars = read_mem_chars(hex_filename)
+    back = hex_chars_to_bits(hex_chars, chars.shape[1]) + np.uint8(ZERO)
+    ok = np.array_equal(back, chars)
+    return ok, chars.size + chars.shape[0], hex_chars.size + hex_chars.shape[0]
+
+# ---------- COMMAND LINE ----------
+# python -m ann_sw.mem_hex tohex  file.mem file.hex
+# python -m ann_sw.mem_hex tobin  file.hex file.mem WIDTH
+# python -m ann_sw.mem_hex check  file.mem [file.hex]
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) == 3 and args[0] == "tohex":
+        bin_file_to_hex(args[1], args[2])
+    elif len(args) == 4 and args[0] == "tobin":
+        hex_file_to_bin(args[1], args[2], int(args[3]))
+    elif len(args) in (2, 3) and args[0] == "check":
+        ok, bin_bytes, hex_bytes = check_roundtrip(*args[1:])
+        print(f"{args[1]}: round-trip {'OK' if ok else 'MISMATCH'}, "
+              f"{bin_bytes} -> {hex_bytes} bytes ({bin_bytes / max(hex_bytes, 1):.2f}x smaller)")
+        sys.exit(0 if ok else 1)
+    else:
+        print("Usage: python -m ann_sw.mem_hex tohex IN OUT | tobin IN OUT WIDTH | check IN [HEX_OUT]")
+        sys.exit(1)
@@ -0,0 +1,177 @@
+import os
+import sys
+
+import numpy as np
+
+from ann_sw.mem_compress import decompress_mem, open_mem
+from ann_sw.mem_decode import NEWLINE
+from ann_sw.mem_hex import resolve_format
+from ann_sw.mem_stream import decode_dataset_chars
+
+# ---------- PARAMETERS ----------
+# Ragged files (CRLF endings, blank lines, mixed widths) get a sidecar
+# "<file>.idx.npy" holding the byte offset of every line start plus the file
+# size as the last entry. It is rebuilt when the source is newer or resized.
+SIDECAR_SUFFIX = ".idx.npy"
+
+# ---------- OFFSET INDEX ----------
+def build_offset_index(filename):
+    """int64 offsets of every non-empty line start, followed by the file size."""
+    data = np.memmap(filename, dtype=np.uint8, mode="r")
+    newlines = np.flatnonzero(data == NEWLINE)
+    starts = np.concatenate([[0], newlines + 1])
+    ends = np.concatenate([newlines, [data.size]])
+    # Drop empty lines ("\n" or "\r\n" only).
+    lengths = ends - starts
+    keep = lengths > 0
+    keep[keep] = ~((lengths[keep] == 1) & (data[starts[keep]] == ord('\r')))
+    return np.concatenate([starts[keep], [data.size]]).astype(np.int64)
+
+def load_offset_index(filename):
+    """Offsets from the sidecar, rebuilding it if it is missing or stale."""
+    sidecar = str(filename) + SIDECAR_SUFFIX
+    size = os.path.getsize(filename)
+    if os.path.exists(sidecar) and os.path.getmtime(sidecar) >= os.path.getmtime(filename):
+        offsets = np.load(sidecar, mmap_mode="r")
+        if offsets.size and offsets[-1] == size:
+            return offsets
+    offsets = build_offset_index(filename)
+    try:
+        np.save(sidecar, offsets)
+    except OSError:
+        pass  # read-only directory: keep the in-memory index
+    return offsets
+
+# ---------- INDEXED ACCESS ----------
+class MemSampleIndex:
+    """
+    O(1) access to sample k of a dataset file such as test_88.mem or
+    test_bin.txt.
+
+    Fixed-width files are memory-mapped and the line width is checked once
+    when the index is opened, after which line k starts at k * (width + 1).
+    Other files go through the sidecar offset index. Either way fetching a
+    few hundred lines only touches those lines' pages. A .gz/.xz file is
+    first decompressed next to itself (decompress_mem), since compressed
+    streams cannot be seeked by line.
+
+        idx = MemSampleIndex("test_88.mem", n=16, x=8)
+        bitstring = idx.line(17)
+        X_fixed, X_float, y = idx.decode(idx.random_indices(300, seed=1))
+    """
+
+    def __init__(self, filename, n=None, x=None, num_features=None, label_bits=4, fmt="auto"):
+        self.fmt = resolve_format(filename, fmt)
+        filename = decompress_mem(filename)
+        self.filename = filename
+        self.n = n
+        self.x = x
+        self.label_bits = label_bits
+        self._data = np.memmap(filename, dtype=np.uint8, mode="r")
+
+        first = np.flatnonzero(np.asarray(self._data[:1 << 20]) == NEWLINE)
+        self.width = int(first[0]) if first.size else self._data.size
+        stride = self.width + 1
+        self.fixed_width = (self._data.size % stride == 0
+                            and bool(np.all(self._data[self.width::stride] == NEWLINE))
+                            and not (self.width and self._data[self.width - 1] == ord('\r')))
+        if self.fixed_width:
+            self.offsets = None
+            self.rows = self._data.size // stride
+        else:
+            self.offsets = load_offset_index(filename)
+            self.rows = self.offsets.size - 1
+
+        if n is not None and num_features is None:
+            line_bits = 4 * self.width if self.fmt == "hex" else self.width
+            num_features = (line_bits - label_bits) // n
+        self.num_features = num_features
+
+    def __len__(self):
+        return self.rows
+
+    def _check(self, k):
+        if k < 0:
+            k += self.rows
+        if not 0 <= k < self.rows:
+            raise IndexError(f"sample {k} out of range for {self.rows} lines in {self.filename}")
+        return k
+
+    def line_bytes(self, k):
+        """Raw bytes of line k without the line ending."""
+        k = self._check(int(k))
+        if self.fixed_width:
+            start = k * (self.width + 1)
+            return bytes(self._data[start:start + self.width])
+        return bytes(self._data[self.offsets[k]:self.offsets[k + 1]]).rstrip(b"\r\n")
+
+    def line(self, k):
+        """Line k as a str, e.g. the bitstring verify.py expects."""
+        return self.line_bytes(k).decode("ascii")
+
+    def chars(self, indices):
+        """(len(indices), width) uint8 ASCII array of the selected lines."""
+        indices = np.asarray(indices, dtype=np.int64)
+        indices = np.where(indices < 0, indices + self.rows, indices)
+        if indices.size and (indices.min() < 0 or indices.max() >= self.rows):
+            raise IndexError(f"sample index out of range for {self.rows} lines in {self.filename}")
+        if self.fixed_width:
+            rows = self._data[:self.rows * (self.width + 1)].reshape(self.rows, self.width + 1)
+            return np.asarray(rows[indices, :self.width])
+        lines = [self.line_bytes(k) for k in indices]
+        if len({len(line) for line in lines}) > 1:
+            raise ValueError(f"{self.filename}: selected lines have different widths")
+        return np.frombuffer(b"".join(lines), dtype=np.uint8).reshape(len(lines), -1)
+
+    def slice(self, start, stop):
+        """chars() for the contiguous range [start, stop)."""
+        start, stop, _ = slice(start, stop).indices(self.rows)
+        return self.chars(np.arange(start, stop))
+
+    def random_indices(self, count, seed=None):
+        """count distinct sorted sample numbers, drawn without replacement."""
+        rng = np.random.default_rng(seed)
+        return np.sort(rng.choice(self.rows, size=min(count, self.rows), replace=False))
+
+    def decode(self, indices):
+        """(X_fixed, X_float, y) for the selected samples; needs n and x."""
+        if self.n is None or self.x is None:
+            raise ValueError("MemSampleIndex needs n and x to decode samples")
+        return decode_dataset_chars(self.chars(indices), self.n, self.x,
+                                    self.num_features, self.label_bits, self.fmt)
+
+    def write_subset(self, indices, out_filename):
+        """Writes the selected lines to a new file for a targeted simulation run."""
+        chars = self.chars(indices)
+        newline = np.full((chars.shape[0], 1), NEWLINE, dtype=np.uint8)
+        with open_mem(out_filename, "wb") as f:
+            f.write(np.concatenate([chars, newline], axis=1).tobytes())
+
+# ---------- COMMAND LINE ----------
+# python -m ann_sw.mem_index show    test_88.mem 17
+# python -m ann_sw.mem_index extract test_88.mem subset.mem 3,5,7
+# python -m ann_sw.mem_index extract test_88.mem subset.mem 100:200
+# python -m ann_sw.mem_index extract test_88.mem subset.mem random:300:1
+def parse_selection(spec, index):
+    if spec.startswith("random:"):
+        parts = spec.split(":")
+        seed = int(parts[2]) if len(parts) > 2 else None
+        return index.random_indices(int(parts[1]), seed)
+    if ":" in spec:
+        start, stop = spec.split(":")
+        start, stop, _ = slice(int(start or 0), int(stop) if stop else None).indices(index.rows)
+        return np.arange(start, stop)
+    return np.array([int(k) for k in spec.split(",")], dtype=np.int64)
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) == 3 and args[0] == "show":
+        print(MemSampleIndex(args[1]).line(int(args[2])))
+    elif len(args) == 4 and args[0] == "extract":
+        index = MemSampleIndex(args[1])
+        selection = parse_selection(args[3], index)
+        index.write_subset(selection, args[2])
+        print(f"Wrote {len(selection)} of {index.rows} samples to {args[2]}")
+    else:
+        print("Usage: python -m ann_sw.mem_index show FILE K | extract FILE OUT (K,K,.. | A:B | random:COUNT[:SEED])")
+        sys.exit(1)
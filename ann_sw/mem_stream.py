@@ -0,0 +1,257 @@
+import queue
+import threading
+from itertools import islice
+
+import numpy as np
+
+from ann_sw.mem_decode import NEWLINE, ZERO, bits_to_fixed, fixed_to_float
+from ann_sw.mem_compress import compression_of, open_mem
+from ann_sw.mem_hex import hex_chars_to_bits, resolve_format
+
+# ---------- BATCH DECODING ----------
+def decode_dataset_chars(chars, n, x, num_features, label_bits=4, fmt="bin"):
+    """
+    Decodes a (rows, line_length) block of ASCII '0'/'1' (or hex digits with
+    fmt='hex') into (X_fixed int64, X_float float32, y int32), like
+    load_mem_dataset().
+    """
+    if fmt == "hex":
+        bits = hex_chars_to_bits(chars, num_features * n + label_bits)
+    else:
+        bits = np.asarray(chars) - np.uint8(ZERO)
+    X_fixed = bits_to_fixed(bits[:, :num_features * n], n)
+    label_start = num_features * n
+    y = bits_to_fixed(bits[:, label_start:label_start + label_bits], label_bits, signed=False)
+    X_float = fixed_to_float(X_fixed, n, x).astype(np.float32)
+    return X_fixed, X_float, y[:, 0].astype(np.int32)
+
+# ---------- PREFETCHING ----------
+# Decoding a batch is mostly NumPy work that releases the GIL, so a reader
+# thread can decode batch k+1 while the caller runs inference on batch k.
+# The bounded queue is the backpressure: the reader blocks once `depth`
+# batches are waiting, so at most depth + 2 batches (queued, being decoded,
+# being consumed) exist at any time.
+PREFETCH_DEPTH = 2
+_DONE = object()
+
+def prefetch(iterable, depth=PREFETCH_DEPTH):
+    """
+    Yields the items of iterable, produced ahead by a background thread
+    into a queue of at most depth items. Exceptions in the producer are
+    re-raised in the consumer; stopping early (break, close()) stops the
+    producer.
+    """
+    items = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((_DONE, e))
+            return
+        put((_DONE, None))
+
+    thread = threading.Thread(target=produce, name="mem-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+# ---------- STREAMING READER ----------
+# keras_generator(shuffle=True) shuffles samples, not only batches: every
+# epoch the batch order is permuted (file order for streamed files), then
+# SHUFFLE_WINDOW consecutive batches of that order are decoded into one
+# buffer whose rows are permuted and cut back into batches. Reads stay
+# batch-sized, memory stays at SHUFFLE_WINDOW batches, and the windows
+# change every epoch. shuffle_window >= len(reader) is the full per-sample
+# shuffle of model.fit(X, y, shuffle=True).
+SHUFFLE_WINDOW = 32
+
+class MemBatchReader:
+    """
+    Constant-memory batched reader for large dataset files such as
+    train_bin.txt (784 pixels x 11 bits + 4-bit label per line).
+
+    Fixed-width files are memory-mapped and each batch is a view of
+    batch_size lines, so peak memory is set by batch_size rather than by the
+    number of lines. Files with CRLF endings or blank lines are read in
+    chunks of batch_size lines instead.
+
+    .gz/.xz files are decompressed as a stream: fixed-width lines are read in
+    blocks of batch_size lines straight from the decompressor, so the
+    decompressed file never has to exist in memory or on disk. Batches then
+    come in file order only (no batch(i), no shuffled batch order; samples
+    are still shuffled within windows, see SHUFFLE_WINDOW).
+
+    prefetch=k decodes up to k batches ahead in a reader thread (see
+    prefetch()), so decoding overlaps the caller's work on the previous
+    batch; 0 decodes on demand.
+
+        reader = MemBatchReader("train_bin.txt", 11, 5, batch_size=256)
+        for X_batch, y_batch in reader:
+            ...
+        model.fit(reader.keras_generator(), steps_per_epoch=len(reader), epochs=10)
+    """
+
+    def __init__(self, filename, n, x, batch_size=1024, num_features=None, label_bits=4, fmt="auto",
+                 prefetch=0):
+        self.filename = filename
+        self.prefetch = prefetch
+        self.fmt = resolve_format(filename, fmt)
+        self.n = n
+        self.x = x
+        self.batch_size = int(batch_size)
+        self.label_bits = label_bits
+
+        self.compression = compression_of(filename)
+        if self.compression:
+            self._data = None
+            with open_mem(filename, "rb") as f:
+                head = np.frombuffer(f.read(1 << 20), dtype=np.uint8)
+        else:
+            self._data = np.memmap(filename, dtype=np.uint8, mode="r")
+            head = np.asarray(self._data[:1 << 20])
+        newlines = np.flatnonzero(head == NEWLINE)
+        if newlines.size == 0:
+            raise ValueError(f"{filename}: first line longer than 1 MB or no newline found")
+        self.width = int(newlines[0])
+        line_bits = 4 * self.width if self.fmt == "hex" else self.width
+        if num_features is None:
+            num_features = (line_bits - label_bits) // n
+        self.num_features = num_features
+        expected = num_features * n + label_bits
+        if line_bits < expected:
+            raise ValueError(f"{filename}: line length {line_bits} bits less than expected {expected}")
+
+        stride = self.width + 1
+        uniform = not np.any(head == ord('\r')) and bool(np.all(np.diff(newlines) == stride))
+        if self.compression:
+            self.fixed_width = False
+            self.stream_blocks = uniform
+        else:
+            self.fixed_width = (uniform and self._data.size % stride == 0
+                                and self._data[-1] == NEWLINE)
+            self.stream_blocks = False
+        if self.fixed_width:
+            self.rows = self._data.size // stride
+        else:
+            with open_mem(filename, "rb") as f:
+                self.rows = sum(1 for line in f if line.strip())
+
+    def __len__(self):
+        """Number of batches per pass over the file."""
+        return (self.rows + self.batch_size - 1) // self.batch_size
+
+    def decode(self, chars):
+        return decode_dataset_chars(chars, self.n, self.x, self.num_features, self.label_bits, self.fmt)
+
+    def read_rows(self, start, stop):
+        """(stop - start, width) uint8 ASCII view of lines [start, stop)."""
+        stride = self.width + 1
+        block = self._data[start * stride:stop * stride]
+        return np.asarray(block).reshape(-1, stride)[:, :self.width]
+
+    def batch(self, index):
+        """Decoded (X_fixed, X_float, y) for batch number index."""
+        if not self.fixed_width:
+            raise ValueError(f"{self.filename}: random batch access needs fixed-width lines")
+        start = index * self.batch_size
+        return self.decode(self.read_rows(start, min(start + self.batch_size, self.rows)))
+
+    def iter_decoded(self):
+        """Yields (X_fixed, X_float, y) for consecutive batches."""
+        if self.prefetch:
+            return prefetch(self._iter_decoded(), self.prefetch)
+        return self._iter_decoded()
+
+    def _iter_decoded(self):
+        if self.fixed_width:
+            for index in range(len(self)):
+                yield self.batch(index)
+            return
+        if self.stream_blocks:
+            yield from self._iter_stream_blocks()
+            return
+        with open_mem(self.filename, "rb") as f:
+            lines = (line.strip() for line in f)
+            lines = (line for line in lines if line)
+            while True:
+                chunk = list(islice(lines, self.batch_size))
+                if not chunk:
+                    return
+                chars = np.frombuffer(b"".join(chunk), dtype=np.uint8)
+                yield self.decode(chars.reshape(len(chunk), -1))
+
+    def _iter_stream_blocks(self):
+        """Fixed-width lines from a compressed stream, batch_size lines per read()."""
+        stride = self.width + 1
+        with open_mem(self.filename, "rb") as f:
+            while True:
+                block = f.read(self.batch_size * stride)
+                if not block:
+                    return
+                chars = np.frombuffer(block, dtype=np.uint8)
+                if chars.size % stride == self.width:
+                    chars = np.append(chars, np.uint8(NEWLINE))  # no newline after the last line
+                if chars.size % stride or np.any(chars[self.width::stride] != NEWLINE):
+                    raise ValueError(f"{self.filename}: lines are not all {self.width} chars wide")
+                yield self.decode(chars.reshape(-1, stride)[:, :self.width])
+
+    def __iter__(self):
+        """Yields (X_float, y) batches."""
+        for _, X_float, y in self.iter_decoded():
+            yield X_float, y
+
+    def keras_generator(self, num_classes=10, shuffle=True, seed=None, shuffle_window=SHUFFLE_WINDOW):
+        """
+        Endless (X_float, y_onehot) generator for model.fit(...,
+        steps_per_epoch=len(reader)). With shuffle=True the samples are
+        shuffled every epoch within windows of shuffle_window batches (see
+        SHUFFLE_WINDOW); each epoch still yields len(reader) batches. Batches
+        are decoded ahead when prefetch is set.
+        """
+        batches = self._keras_batches(num_classes, shuffle, seed, shuffle_window)
+        return prefetch(batches, self.prefetch) if self.prefetch else batches
+
+    def _keras_batches(self, num_classes, shuffle, seed, shuffle_window):
+        rng = np.random.default_rng(seed)
+        eye = np.eye(num_classes, dtype=np.float32)
+        while True:
+            if self.fixed_width and shuffle:
+                batches = (self.batch(index) for index in rng.permutation(len(self)))
+            else:
+                batches = self._iter_decoded()
+            if not shuffle:
+                for _, X_float, y in batches:
+                    yield X_float, eye[y]
+                continue
+            while True:
+                window = [(X_float, y) for _, X_float, y in islice(batches, max(1, shuffle_window))]
+                if not window:
+                    break
+                X_float = np.concatenate([X for X, _ in window])
+                y = np.concatenate([labels for _, labels in window])
+                order = rng.permutation(len(y))
+                for start in range(0, len(order), self.batch_size):
+                    rows = order[start:start + self.batch_size]
+                    yield X_float[rows], eye[y[rows]]
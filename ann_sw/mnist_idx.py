@@ -0,0 +1,90 @@
+import os
+from pathlib import Path
+
+import numpy as np
+
+# ---------- PARAMETERS ----------
+# IDX header: two zero bytes, a type code, the number of dimensions, then one
+# big-endian uint32 per dimension. The data follows immediately.
+IDX_DTYPES = {
+    0x08: np.dtype(np.uint8),
+    0x09: np.dtype(np.int8),
+    0x0B: np.dtype('>i2'),
+    0x0C: np.dtype('>i4'),
+    0x0D: np.dtype('>f4'),
+    0x0E: np.dtype('>f8'),
+}
+
+MNIST_FILES = {
+    "train_images": "train-images-idx3-ubyte",
+    "train_labels": "train-labels-idx1-ubyte",
+    "test_images": "t10k-images-idx3-ubyte",
+    "test_labels": "t10k-labels-idx1-ubyte",
+}
+
+# ---------- IDX READER ----------
+def read_idx_header(filename):
+    """Returns (dtype, shape, data offset) of an idx file."""
+    with open(filename, "rb") as f:
+        header = f.read(4)
+        if len(header) != 4 or header[0] != 0 or header[1] != 0:
+            raise ValueError(f"{filename}: not an idx file (bad magic {header!r})")
+        type_code, ndim = header[2], header[3]
+        if type_code not in IDX_DTYPES:
+            raise ValueError(f"{filename}: unknown idx type code 0x{type_code:02x}")
+        shape = tuple(int(d) for d in np.frombuffer(f.read(4 * ndim), dtype='>u4'))
+    return IDX_DTYPES[type_code], shape, 4 + 4 * ndim
+
+def read_idx(filename):
+    """
+    Memory-maps an idx1/idx3-ubyte file as a read-only array shaped from its
+    header, e.g. (60000, 28, 28) uint8 for train-images. Nothing is copied
+    until the pages are touched.
+    """
+    dtype, shape, offset = read_idx_header(filename)
+    expected = offset + int(np.prod(shape)) * dtype.itemsize
+    if os.path.getsize(filename) < expected:
+        raise ValueError(f"{filename}: file is shorter than its header {shape} says")
+    return np.memmap(filename, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+def find_idx_file(directory, stem):
+    """
+    Locates an MNIST file under directory, accepting both the original
+    'train-labels-idx1-ubyte' name and the 'train-labels.idx1-ubyte' variant,
+    either directly or inside a folder of the same name (archive/ layout).
+    """
+    directory = Path(directory)
+    dotted = stem[::-1].replace("-", ".", 1)[::-1]
+    for name in (stem, dotted):
+        for candidate in (directory / name, directory / name / name):
+            if candidate.is_file():
+                return candidate
+    raise FileNotFoundError(
+        f"{stem} not found in {directory}. Download the MNIST idx files "
+        f"(e.g. the Kaggle 'archive' folder) and place them there.")
+
+# ---------- MNIST ----------
+def load_mnist(directory="archive"):
+    """
+    Offline replacement for tensorflow.keras.datasets.mnist.load_data().
+
+    Returns ((x_train, y_train), (x_test, y_test)) as memory-mapped uint8
+    arrays of shape (60000, 28, 28) / (60000,) and (10000, 28, 28) / (10000,).
+    """
+    arrays = {key: read_idx(find_idx_file(directory, stem)) for key, stem in MNIST_FILES.items()}
+    for split in ("train", "test"):
+        if len(arrays[f"{split}_images"]) != len(arrays[f"{split}_labels"]):
+            raise ValueError(f"MNIST {split} images and labels have different lengths")
+    return ((arrays["train_images"], arrays["train_labels"]),
+            (arrays["test_images"], arrays["test_labels"]))
+
+def train_val_split(num_samples, num_train=50000, seed=42):
+    """
+    Index arrays for the seeded train/validation split used by input_generator.
+
+    Same permutation as np.random.seed(seed); np.random.permutation(num_samples),
+    so the generated files do not change. Indices are returned instead of
+    gathered arrays so callers can gather chunk by chunk from the memmap.
+    """
+    indices = np.random.RandomState(seed).permutation(num_samples)
+    return indices[:num_train], indices[num_train:]
@@ -0,0 +1,261 @@
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from ann_sw.mem_decode import fixed_to_float, load_mem_params
+from ann_sw.mem_encode import NEWLINE, fixed_to_bit_chars
+from ann_sw.mem_hex import bit_chars_to_hex_chars, resolve_format
+
+# ---------- PARAMETERS ----------
+# Bundle layout (.annb):
+#   8 bytes   magic b"ANNBNDL1"
+#   8 bytes   little-endian uint64 length of the JSON header
+#   header    JSON index: dims, per-layer activation, Q-formats and the
+#             offset/shape/dtype of every tensor
+#   padding   up to the next ALIGN-byte boundary, where the data section starts
+#   tensors   raw little-endian two's complement integers; offsets in the
+#             header are relative to the data section and ALIGN-aligned, so
+#             np.memmap views need no copy
+# Tensors use the narrowest of int8/16/32/64 that holds their n bits.
+MAGIC = b"ANNBNDL1"
+ALIGN = 64
+
+_LAYER_FILE = re.compile(r"layer(\d+)_weights\.(mem|hex|memh)$")
+
+def storage_dtype(n):
+    """Narrowest little-endian signed dtype for n-bit two's complement values."""
+    for bits in (8, 16, 32, 64):
+        if n <= bits:
+            return np.dtype(f"<i{bits // 8}")
+    raise ValueError(f"{n}-bit fields do not fit in int64")
+
+def _aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+def default_activations(num_layers):
+    """ReLU on hidden layers and softmax on the output, as in every evaluator here."""
+    return ["relu"] * (num_layers - 1) + ["softmax"]
+
+# ---------- WRITER ----------
+def write_bundle(filename, layers, meta=None):
+    """
+    Writes a model bundle.
+
+    layers is a list of dicts, one per layer:
+        {"weights": (out_dim, in_dim) ints, "biases": (out_dim,) ints,
+         "w_format": (n, x), "b_format": (n, x), "activation": "relu"}
+    meta is an optional JSON-serializable dict stored in the header.
+    """
+    tensors = []
+    entries = []
+    offset = 0
+    for i, layer in enumerate(layers):
+        weights = np.asarray(layer["weights"])
+        biases = np.asarray(layer["biases"]).reshape(-1)
+        if weights.ndim != 2 or weights.shape[0] != biases.shape[0]:
+            raise ValueError(f"layer {i + 1}: weights {weights.shape} do not match biases {biases.shape}")
+        entry = {"activation": layer.get("activation", "relu")}
+        for key, arr, fmt in (("weights", weights, layer["w_format"]), ("biases", biases, layer["b_format"])):
+            n, x = (int(v) for v in fmt)
+            lo, hi = -(1 << (n - 1)), (1 << (n - 1)) - 1
+            if arr.size and (arr.min() < lo or arr.max() > hi):
+                raise ValueError(f"layer {i + 1} {key}: values outside the {n}-bit range")
+            data = np.ascontiguousarray(arr, dtype=storage_dtype(n))
+            entry[key] = {"n": n, "x": x, "shape": list(arr.shape), "dtype": data.dtype.str, "offset": offset}
+            tensors.append((offset, data))
+            offset = _aligned(offset + data.nbytes)
+        entries.append(entry)
+
+    dims = [entries[0]["weights"]["shape"][1]] + [e["weights"]["shape"][0] for e in entries] if entries else []
+    header = {"version": 1, "dims": dims, "layers": entries, "meta": meta or {}}
+
+    blob = json.dumps(header, sort_keys=True).encode()
+    data_start = _aligned(len(MAGIC) + 8 + len(blob))
+
+    tmp = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + len(blob).to_bytes(8, "little") + blob)
+        for start, data in tensors:
+            f.write(b"\0" * (data_start + start - f.tell()))
+            f.write(data.tobytes())
+    os.replace(tmp, filename)
+    return filename
+
+# ---------- READER ----------
+class BundleLayer:
+    """One layer of a ModelBundle; weights and biases are read-only memmap views."""
+
+    def __init__(self, index, entry, data):
+        # data is the memmap of the bundle's data section
+        self.index = index
+        self.activation = entry["activation"]
+        self.w_format = (entry["weights"]["n"], entry["weights"]["x"])
+        self.b_format = (entry["biases"]["n"], entry["biases"]["x"])
+        self.weights = self._view(data, entry["weights"])
+        self.biases = self._view(data, entry["biases"])
+
+    @staticmethod
+    def _view(data, info):
+        dtype = np.dtype(info["dtype"])
+        count = int(np.prod(info["shape"]))
+        start = info["offset"]
+        return data[start:start + count * dtype.itemsize].view(dtype).reshape(info["shape"])
+
+    @property
+    def in_dim(self):
+        return self.weights.shape[1]
+
+    @property
+    def out_dim(self):
+        return self.weights.shape[0]
+
+    def weights_float(self):
+        return fixed_to_float(self.weights, *self.w_format)
+
+    def biases_float(self):
+        return fixed_to_float(self.biases, *self.b_format)
+
+    def __repr__(self):
+        return (f"BundleLayer({self.index + 1}: {self.in_dim}->{self.out_dim} {self.activation}, "
+                f"w Q({self.w_format[0]},{self.w_format[1]}), b Q({self.b_format[0]},{self.b_format[1]}))")
+
+class ModelBundle:
+    """
+    Read-only view of a .annb model bundle.
+
+    Opening a bundle parses only the JSON header; the tensors are views of
+    one np.memmap of the file, so switching between many candidate models
+    costs a few page faults instead of re-parsing .mem text.
+
+        model = ModelBundle("best_booth.annb")
+        for layer in model.layers:
+            x = layer.weights_float() @ x + layer.biases_float()
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            magic = f.read(len(MAGIC))
+            if magic != MAGIC:
+                raise ValueError(f"{filename}: not a model bundle (bad magic {magic!r})")
+            length = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(length))
+        if header.get("version") != 1:
+            raise ValueError(f"{filename}: unsupported bundle version {header.get('version')}")
+        self.dims = header["dims"]
+        self.meta = header["meta"]
+        data_start = _aligned(len(MAGIC) + 8 + length)
+        self._data = np.memmap(filename, dtype=np.uint8, mode="r", offset=data_start)
+        self.layers = [BundleLayer(i, entry, self._data) for i, entry in enumerate(header["layers"])]
+
+    def __len__(self):
+        return len(self.layers)
+
+    def __getitem__(self, index):
+        return self.layers[index]
+
+    def __iter__(self):
+        return iter(self.layers)
+
+    def __repr__(self):
+        return f"ModelBundle({self.filename!r}, dims={self.dims})"
+
+# ---------- LEGACY .mem CONVERSION ----------
+def find_layer_files(directory):
+    """
+    Consecutive (weights, biases) file pairs layer1.., layer2.., ... in directory.
+    Stops at the first missing pair, like the evaluators' exists() loop.
+    """
+    directory = Path(directory)
+    found = {}
+    for path in directory.iterdir():
+        match = _LAYER_FILE.match(path.name)
+        if match:
+            found[int(match.group(1))] = path
+    pairs = []
+    for k in range(1, len(found) + 1):
+        if k not in found:
+            break
+        weights = found[k]
+        biases = weights.with_name(weights.name.replace("_weights", "_biases"))
+        if not biases.exists():
+            break
+        pairs.append((weights, biases))
+    return pairs
+
+def bundle_from_mem(directory, w_format, b_format, out_filename, activations=None, fmt="auto", meta=None):
+    """
+    Packs layerN_weights.mem / layerN_biases.mem from directory into one bundle.
+
+    w_format and b_format are (n, x) for all layers, or lists with one (n, x)
+    per layer (e.g. a 16-bit output bias). Layer dims come from the files.
+    """
+    pairs = find_layer_files(directory)
+    if not pairs:
+        raise FileNotFoundError(f"no layer1_weights/layer1_biases files in {directory}")
+    per_layer = lambda f: list(f) if isinstance(f[0], (tuple, list)) else [tuple(f)] * len(pairs)
+    w_formats, b_formats = per_layer(w_format), per_layer(b_format)
+    activations = activations or default_activations(len(pairs))
+    layers = []
+    for (w_file, b_file), wq, bq, act in zip(pairs, w_formats, b_formats, activations):
+        weights, _ = load_mem_params(w_file, wq[0], wq[1], fmt=fmt)
+        biases, _ = load_mem_params(b_file, bq[0], bq[1], num_fields=1, fmt=fmt)
+        layers.append({"weights": weights, "biases": biases[:, 0], "w_format": wq,
+                       "b_format": bq, "activation": act})
+    meta = dict(meta or {}, source=str(directory))
+    return write_bundle(out_filename, layers, meta)
+
+def _write_mem(fixed, n, filename, fmt):
+    chars = fixed_to_bit_chars(fixed, n)
+    if fmt == "hex":
+        chars = bit_chars_to_hex_chars(chars)
+    newline = np.full((chars.shape[0], 1), NEWLINE, dtype=np.uint8)
+    with open(filename, "wb") as f:
+        f.write(np.concatenate([chars, newline], axis=1).tobytes())
+
+def bundle_to_mem(bundle_filename, directory, fmt="bin"):
+    """
+    Writes layerN_weights.mem / layerN_biases.mem back out of a bundle
+    ($readmemh lines for fmt='hex'), byte-identical to the exporters' output.
+    Returns the list of files written.
+    """
+    fmt = resolve_format("", fmt)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    written = []
+    for layer in ModelBundle(bundle_filename):
+        k = layer.index + 1
+        w_file = directory / f"layer{k}_weights.mem"
+        b_file = directory / f"layer{k}_biases.mem"
+        _write_mem(layer.weights, layer.w_format[0], w_file, fmt)
+        _write_mem(layer.biases.reshape(-1, 1), layer.b_format[0], b_file, fmt)
+        written += [w_file, b_file]
+    return written
+
+# ---------- COMMAND LINE ----------
+# python -m ann_sw.model_bundle pack   "Best - booth" best_booth.annb 16 8 32 16 [bin|hex]
+# python -m ann_sw.model_bundle unpack best_booth.annb out_dir [bin|hex]
+# python -m ann_sw.model_bundle info   best_booth.annb
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) in (7, 8) and args[0] == "pack":
+        w_q, b_q = (int(args[3]), int(args[4])), (int(args[5]), int(args[6]))
+        bundle_from_mem(args[1], w_q, b_q, args[2], fmt=args[7] if len(args) == 8 else "auto")
+        print(ModelBundle(args[2]))
+    elif len(args) in (3, 4) and args[0] == "unpack":
+        files = bundle_to_mem(args[1], args[2], args[3] if len(args) == 4 else "bin")
+        print(f"Wrote {len(files)} files to {args[2]}")
+    elif len(args) == 2 and args[0] == "info":
+        model = ModelBundle(args[1])
+        print(model)
+        for layer in model:
+            print(f"  {layer}")
+        if model.meta:
+            print(f"  meta: {model.meta}")
+    else:
+        print("Usage: python -m ann_sw.model_bundle pack DIR OUT W_N W_X B_N B_X [bin|hex] | unpack BUNDLE DIR [bin|hex] | info BUNDLE")
+        sys.exit(1)
@@ -0,0 +1,163 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ann_sw.fixed_inference import fixed_forward
+from ann_sw.inference import forward
+from ann_sw.mem_decode import load_mem_dataset
+from ann_sw.model_bundle import ModelBundle
+
+# ---------- PARAMETERS ----------
+# The test set is copied once into multiprocessing.shared_memory; every
+# worker maps it in its initializer, so tasks only carry
+# (model, start, stop) and results are a shard's predictions plus its
+# correct count and confusion matrix. Work is split into models x sample
+# shards, about TASKS_PER_WORKER tasks per worker, so one model over 10k
+# samples and many models over the same set both keep every core busy.
+#
+# A model is any picklable callable mapping an (N, features) block to
+# (N, classes) scores, e.g. float_model() or fixed_model() below.
+#
+# Workers are forked (the default on Linux), so the evaluator scripts, which
+# have no __main__ guard, can call evaluate() directly. Each worker is meant
+# to use one core: with a threaded BLAS, set OPENBLAS_NUM_THREADS=1 (or
+# OMP_NUM_THREADS=1) before starting the script to avoid oversubscription.
+NUM_WORKERS = os.cpu_count() or 1
+TASKS_PER_WORKER = 4
+NUM_CLASSES = 10
+
+# ---------- MODELS ----------
+def float_model(weights, biases, activations=None):
+    """Float GEMM model (ann_sw.inference.forward) returning logits."""
+    return partial(forward, weights=[np.asarray(w) for w in weights],
+                   biases=[np.asarray(b) for b in biases], activations=activations)
+
+def fixed_model(weights, biases, f_in, f_prod, f_b, n_a, x_a, acc_bits=None, narrow=False):
+    """Bit-exact integer model (ann_sw.fixed_inference.fixed_forward) returning Q(n_a, x_a) outputs."""
+    return partial(fixed_forward, weights=[np.asarray(w) for w in weights],
+                   biases=[np.asarray(b) for b in biases], f_in=f_in, f_prod=f_prod, f_b=f_b,
+                   n_a=n_a, x_a=x_a, acc_bits=acc_bits, narrow=narrow)
+
+def bundle_model(filename):
+    """Float model of a .annb model bundle, using its stored activations."""
+    bundle = ModelBundle(filename)
+    return float_model([layer.weights_float() for layer in bundle],
+                       [layer.biases_float() for layer in bundle],
+                       [layer.activation for layer in bundle])
+
+# ---------- SHARED ARRAYS ----------
+def share_array(array):
+    """Copies array into a new shared memory block. Returns (shm, descriptor)."""
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+def attach_array(descriptor):
+    """Maps a share_array() descriptor. Returns (shm, array); keep shm alive while using array."""
+    name, shape, dtype = descriptor
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+# ---------- WORKER ----------
+_worker = None
+
+def _init_worker(x_descriptor, y_descriptor, models, num_classes):
+    global _worker
+    x_shm, X = attach_array(x_descriptor)
+    y_shm, y = attach_array(y_descriptor)
+    _worker = {"shm": (x_shm, y_shm), "X": X, "y": y, "models": models, "num_classes": num_classes}
+
+def confusion_matrix(y, predictions, num_classes=NUM_CLASSES):
+    """(num_classes, num_classes) int64 counts; rows are labels, columns predictions."""
+    y = np.asarray(y, dtype=np.int64)
+    predictions = np.asarray(predictions, dtype=np.int64)
+    if len(y) and (y.max() >= num_classes or predictions.max() >= num_classes):
+        raise ValueError(f"labels or predictions outside 0..{num_classes - 1}")
+    counts = np.bincount(y * num_classes + predictions, minlength=num_classes * num_classes)
+    return counts.reshape(num_classes, num_classes)
+
+def _evaluate_shard(task):
+    """Worker task: one model over samples start:stop of the shared test set."""
+    model_index, start, stop = task
+    X, y = _worker["X"][start:stop], _worker["y"][start:stop]
+    predictions = np.argmax(_worker["models"][model_index](X), axis=1)
+    confusion = confusion_matrix(y, predictions, _worker["num_classes"])
+    return model_index, start, predictions, int(np.trace(confusion)), confusion
+
+# ---------- DRIVER ----------
+def plan_shards(num_samples, num_models, workers, shard_rows=None):
+    """(start, stop) sample ranges so that models x shards gives each worker ~TASKS_PER_WORKER tasks."""
+    if shard_rows is None:
+        shards = -(-workers * TASKS_PER_WORKER // max(1, num_models))
+        shard_rows = -(-num_samples // shards)
+    shard_rows = max(1, shard_rows)
+    return [(start, min(start + shard_rows, num_samples)) for start in range(0, num_samples, shard_rows)]
+
+def evaluate(X, y, models, workers=NUM_WORKERS, shard_rows=None, num_classes=NUM_CLASSES):
+    """
+    Scores every model on the labelled set (X, y), sharded over a process pool.
+
+    Returns one (predictions, accuracy, confusion) per model: predictions
+    for all samples in order, accuracy in percent and the merged
+    (num_classes, num_classes) confusion matrix. workers=1 runs in this
+    process without shared memory, with identical results.
+    """
+    X = np.asarray(X)
+    y = np.asarray(y)
+    if len(X) != len(y):
+        raise ValueError(f"{len(X)} samples but {len(y)} labels")
+    models = list(models)
+    shards = plan_shards(len(X), len(models), workers, shard_rows)
+    tasks = [(m, start, stop) for m in range(len(models)) for start, stop in shards]
+
+    if workers > 1 and len(tasks) > 1:
+        x_shm, x_descriptor = share_array(X)
+        y_shm, y_descriptor = share_array(y)
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker,
+                                     initargs=(x_descriptor, y_descriptor, models, num_classes)) as pool:
+                results = list(pool.map(_evaluate_shard, tasks))
+        finally:
+            for shm in (x_shm, y_shm):
+                shm.close()
+                shm.unlink()
+    else:
+        global _worker
+        _worker = {"X": X, "y": y, "models": models, "num_classes": num_classes}
+        try:
+            results = [_evaluate_shard(task) for task in tasks]
+        finally:
+            _worker = None
+
+    # Merge shards per model: predictions in sample order, counts summed.
+    merged = []
+    for m in range(len(models)):
+        parts = sorted((r for r in results if r[0] == m), key=lambda r: r[1])
+        predictions = np.concatenate([r[2] for r in parts]) if parts else np.zeros(0, dtype=np.int64)
+        correct = sum(r[3] for r in parts)
+        confusion = sum((r[4] for r in parts), np.zeros((num_classes, num_classes), dtype=np.int64))
+        accuracy = correct / len(X) * 100 if len(X) else None
+        merged.append((predictions, accuracy, confusion))
+    return merged
+
+# ---------- COMMAND LINE ----------
+# python -m ann_sw.parallel_eval test_bin.txt 11 5 model_a.annb model_b.annb ... [-jWORKERS]
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("-j")]
+    jobs = [int(a[2:]) for a in sys.argv[1:] if a.startswith("-j")]
+    if len(args) >= 4:
+        filenames = args[3:]
+        models = [bundle_model(f) for f in filenames]
+        features = ModelBundle(filenames[0]).dims[0]
+        _, X_test, y_test = load_mem_dataset(args[0], int(args[1]), int(args[2]), num_features=features)
+        results = evaluate(X_test, y_test, models, workers=jobs[-1] if jobs else NUM_WORKERS)
+        for filename, (_, accuracy, _) in sorted(zip(filenames, results), key=lambda r: -r[1][1]):
+            print(f"{accuracy:6.2f}%  {filename}")
+    else:
+        print("Usage: python -m ann_sw.parallel_eval DATASET N_IN X_IN BUNDLE [BUNDLE ...] [-jWORKERS]")
+        sys.exit(1)
@@ -0,0 +1,237 @@
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from ann_sw.fixed_inference import align_bias, fixed_predict, narrow_plan
+from ann_sw.mem_decode import load_mem_dataset
+from ann_sw.mem_encode import quantize_to_fixed
+from ann_sw.model_bundle import ModelBundle
+from ann_sw.parallel_eval import NUM_WORKERS, attach_array, share_array
+
+# ---------- PARAMETERS ----------
+# Mixed-precision sweep. A trained float model (float weights and biases,
+# e.g. from Keras get_weights() or a high-precision .annb bundle) is
+# quantized to every grid point and scored bit-exactly with
+# ann_sw.fixed_inference, the integer model of block_temp_inference's
+# datapath. A point is one (n, x) weight and bias format per layer plus
+# one activation format, the datawidth / int_part_input every block.sv
+# instance shares. Weights and biases are rounded half to even and
+# saturated like the .mem exporters (quantize_to_fixed), so a point's
+# accuracy is what its exported files would give.
+#
+# The decoded test set is copied once into shared memory and the float
+# weights are sent once per worker; a task only carries its point. Finished
+# points are appended to a JSON-lines checkpoint as they complete, so an
+# interrupted sweep resumes with the points still missing.
+#
+# Cost of a point is its total storage in bits: every weight and bias at
+# its own width plus one activation register per input and neuron.
+W_FORMATS = [(8, 4), (11, 5), (16, 8)]
+B_FORMATS = [(16, 8), (22, 10), (32, 16)]
+A_FORMATS = [(8, 4), (12, 6), (16, 8)]
+
+# ---------- GRID ----------
+def _layer_choices(formats, num_layers):
+    """A flat list of (n, x) is offered to every layer; a list of lists gives per-layer candidates."""
+    formats = list(formats)
+    if formats and isinstance(formats[0][0], (list, tuple)):
+        if len(formats) != num_layers:
+            raise ValueError(f"{len(formats)} per-layer format lists for {num_layers} layers")
+        return [[tuple(f) for f in layer] for layer in formats]
+    return [[tuple(f) for f in formats]] * num_layers
+
+def grid(num_layers, weight_formats=W_FORMATS, bias_formats=B_FORMATS, act_formats=A_FORMATS, uniform=False):
+    """
+    Sweep points (w_formats, b_formats, a_format): one (n, x) per layer for
+    weights and biases and one activation format. Every layer picks its
+    formats independently (mixed precision) unless uniform=True, which
+    gives all layers the same weight and the same bias format.
+    """
+    w_choices = _layer_choices(weight_formats, num_layers)
+    b_choices = _layer_choices(bias_formats, num_layers)
+    if uniform:
+        w_layers = [(f,) * num_layers for f in w_choices[0]]
+        b_layers = [(f,) * num_layers for f in b_choices[0]]
+    else:
+        w_layers = list(itertools.product(*w_choices))
+        b_layers = list(itertools.product(*b_choices))
+    return [(w, b, tuple(a)) for w in w_layers for b in b_layers for a in act_formats]
+
+def point_bits(point, dims):
+    """Total storage bits of a point for layer sizes dims = [in_dim, hidden..., out_dim]."""
+    w_formats, b_formats, (n_a, _) = point
+    bits = n_a * sum(dims)
+    for l, ((n_w, _), (n_b, _)) in enumerate(zip(w_formats, b_formats)):
+        bits += n_w * dims[l] * dims[l + 1] + n_b * dims[l + 1]
+    return bits
+
+def _point_key(point):
+    w_formats, b_formats, a_format = point
+    return json.dumps([[list(f) for f in w_formats], [list(f) for f in b_formats], list(a_format)])
+
+# ---------- CHECKPOINT ----------
+def load_checkpoint(filename):
+    """Finished records of a checkpoint file by point key; a torn last line is ignored."""
+    records = {}
+    if filename is None or not os.path.exists(filename):
+        return records
+    with open(filename) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record["key"]] = record
+    return records
+
+def _open_checkpoint(filename):
+    """Opens a checkpoint for appending, ending a torn last line so new records start on their own."""
+    out = open(filename, "ab+")
+    if out.seek(0, os.SEEK_END):
+        out.seek(-1, os.SEEK_END)
+        if out.read(1) != b"\n":
+            out.write(b"\n")
+    return out
+
+# ---------- WORKER ----------
+_worker = None
+
+def _init_worker(x_descriptor, y_descriptor, weights, biases, f_in):
+    global _worker
+    x_shm, X = attach_array(x_descriptor)
+    y_shm, y = attach_array(y_descriptor)
+    _worker = {"shm": (x_shm, y_shm), "X": X, "y": y, "weights": weights, "biases": biases, "f_in": f_in}
+
+def evaluate_point(X_fixed, y, f_in, weights, biases, point):
+    """
+    Quantizes the float weights and biases to one point and scores it.
+    Returns (accuracy, exact); exact is False when a layer's worst-case sum
+    exceeds int64, so the int64 engine may have wrapped.
+    """
+    w_formats, b_formats, (n_a, x_a) = point
+    w_fixed = [quantize_to_fixed(w, n, x) for w, (n, x) in zip(weights, w_formats)]
+    b_fixed = [quantize_to_fixed(b, n, x) for b, (n, x) in zip(biases, b_formats)]
+    f_prod = [(n_a - x_a) + (n - x) for n, x in w_formats]
+    f_b = [n - x for n, x in b_formats]
+    try:
+        narrow_plan(w_fixed, [align_bias(b, fb, fp) for b, fb, fp in zip(b_fixed, f_b, f_prod)], n_a)
+        exact = True
+    except OverflowError:
+        exact = False
+    _, _, accuracy = fixed_predict(X_fixed, w_fixed, b_fixed, f_in, f_prod, f_b, n_a, x_a, y=y, narrow=exact)
+    return accuracy, exact
+
+def _evaluate_task(point):
+    w = _worker
+    return point, evaluate_point(w["X"], w["y"], w["f_in"], w["weights"], w["biases"], point)
+
+# ---------- DRIVER ----------
+def sweep(X_fixed, y, f_in, weights, biases, points, workers=NUM_WORKERS, checkpoint=None, progress=None):
+    """
+    Scores every point on the fixed-point test set (X_fixed with f_in
+    fractional bits, labels y). weights[l] is (out_dim, in_dim) and
+    biases[l] (out_dim,) floats.
+
+    Points already in checkpoint are not run again; new results are
+    appended to it one line per point. progress(record, done, total) is
+    called after each new point. Returns one record per point, in order:
+    key, weights, biases, activations, accuracy, bits and exact.
+    """
+    weights = [np.asarray(w, dtype=np.float64) for w in weights]
+    biases = [np.asarray(b, dtype=np.float64).reshape(-1) for b in biases]
+    dims = [weights[0].shape[1]] + [w.shape[0] for w in weights]
+    records = load_checkpoint(checkpoint)
+    todo = [p for p in points if _point_key(p) not in records]
+    out = _open_checkpoint(checkpoint) if checkpoint is not None else None
+
+    def finish(point, result):
+        accuracy, exact = result
+        w_formats, b_formats, a_format = point
+        record = {"key": _point_key(point), "weights": [list(f) for f in w_formats],
+                  "biases": [list(f) for f in b_formats], "activations": list(a_format),
+                  "accuracy": accuracy, "bits": point_bits(point, dims), "exact": exact}
+        records[record["key"]] = record
+        if out is not None:
+            out.write((json.dumps(record) + "\n").encode())
+            out.flush()
+        if progress is not None:
+            progress(record, len(points) - len(todo) + done + 1, len(points))
+
+    try:
+        if workers > 1 and len(todo) > 1:
+            x_shm, x_descriptor = share_array(X_fixed)
+            y_shm, y_descriptor = share_array(y)
+            pool = ProcessPoolExecutor(max_workers=min(workers, len(todo)), initializer=_init_worker,
+                                       initargs=(x_descriptor, y_descriptor, weights, biases, f_in))
+            try:
+                pending = {pool.submit(_evaluate_task, p) for p in todo}
+                done = 0
+                while pending:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        finish(*future.result())
+                        done += 1
+            finally:
+                # On an interrupt, drop the queued points instead of running them all
+                pool.shutdown(cancel_futures=True)
+                for shm in (x_shm, y_shm):
+                    shm.close()
+                    shm.unlink()
+        else:
+            for done, point in enumerate(todo):
+                finish(point, evaluate_point(X_fixed, y, f_in, weights, biases, point))
+    finally:
+        if out is not None:
+            out.close()
+    return [records[_point_key(p)] for p in points]
+
+# ---------- REPORT ----------
+def pareto_front(records):
+    """Records no other record beats on both bits (fewer) and accuracy (higher), cheapest first."""
+    front = []
+    for record in sorted(records, key=lambda r: (r["bits"], -r["accuracy"])):
+        if not front or record["accuracy"] > front[-1]["accuracy"]:
+            front.append(record)
+    return front
+
+def _formats(formats):
+    return " ".join(f"Q({n},{x})" for n, x in formats)
+
+def table(records, front=None):
+    """Report lines, most accurate first; Pareto points are marked '*', possible wraps '!'."""
+    on_front = {r["key"] for r in (front if front is not None else pareto_front(records))}
+    lines = [f"  {'accuracy':>8}  {'bits':>9}  {'activations':11}  {'weights':35}  biases"]
+    for r in sorted(records, key=lambda r: (-r["accuracy"], r["bits"])):
+        mark = ("*" if r["key"] in on_front else " ") + (" " if r["exact"] else "!")
+        lines.append(f"{mark}{r['accuracy']:7.2f}%  {r['bits']:9d}  {_formats([r['activations']]):11}  "
+                     f"{_formats(r['weights']):35}  {_formats(r['biases'])}")
+    return lines
+
+# ---------- COMMAND LINE ----------
+# python -m ann_sw.qformat_sweep model.annb test_bin.txt 11 5 [sweep.jsonl] [--uniform] [-jWORKERS]
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("-j") and a != "--uniform"]
+    jobs = [int(a[2:]) for a in sys.argv[1:] if a.startswith("-j")]
+    if len(args) not in (4, 5):
+        print("Usage: python -m ann_sw.qformat_sweep BUNDLE DATASET N_IN X_IN [CHECKPOINT] [--uniform] [-jWORKERS]")
+        sys.exit(1)
+    bundle = ModelBundle(args[0])
+    n_in, x_in = int(args[2]), int(args[3])
+    X_fixed, _, y_test = load_mem_dataset(args[1], n_in, x_in, num_features=bundle.dims[0])
+    points = grid(len(bundle), uniform="--uniform" in sys.argv[1:])
+    records = sweep(X_fixed, y_test, n_in - x_in, [layer.weights_float() for layer in bundle],
+                    [layer.biases_float() for layer in bundle], points,
+                    workers=jobs[-1] if jobs else NUM_WORKERS, checkpoint=args[4] if len(args) == 5 else None,
+                    progress=lambda r, done, total: print(f"[{done}/{total}] {r['accuracy']:6.2f}%  {r['bits']} bits",
+                                                          file=sys.stderr))
+    front = pareto_front(records)
+    for line in table(records, front):
+        print(line)
+    print(f"\nPareto front (accuracy vs total bits), {len(front)} of {len(records)} points:")
+    for r in front:
+        print(f"  {r['bits']:9d} bits  {r['accuracy']:6.2f}%  a {_formats([r['activations']])}  "
+              f"w {_formats(r['weights'])}  b {_formats(r['biases'])}")
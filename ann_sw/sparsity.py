@@ -0,0 +1,111 @@
+import numpy as np
+
+# ---------- PARAMETERS ----------
+# Zero-skipping model. After ReLU many layer inputs are exactly 0, yet every
+# block_booth.sv column still runs a full sequential Booth multiply:
+# booth_multiplier.sv spends one IDLE cycle, DATAWIDTH RUN steps, one more
+# RUN cycle at count == 0 and one FINISH cycle per product.
+#
+# The cycle estimate assumes each neuron row has `lanes` multipliers fed
+# from a compacted stream of its sample's inputs: dense hardware needs
+# ceil(fan_in / lanes) multiply rounds per sample and layer, a zero-skipping
+# array ceil(nonzero / lanes). lanes = fan_in is today's fully parallel
+# array, where a round is skipped only when every input is zero; fewer lanes
+# model a time-multiplexed array, where skipping pays off directly.
+REPORT_LANES = (1, 8, None)     # None = fan_in (one multiplier per column)
+
+def booth_mac_cycles(datawidth):
+    """Clock cycles of one booth_multiplier.sv product: IDLE + DATAWIDTH + 1 + FINISH."""
+    return datawidth + 3
+
+# ---------- STATISTICS ----------
+class SparsityStats:
+    """
+    Per-layer, per-sample count of nonzero layer inputs, collected by the
+    engines (sparsity=...). Layer 0's inputs are the pixels, later layers'
+    the ReLU outputs of the previous layer.
+
+    nonzero[l]  (samples,) nonzero inputs of layer l per sample
+    fan_in[l], fan_out[l]  layer shape
+    macs[l]     multiplies actually performed (zero-skipping execution only)
+    """
+
+    def __init__(self):
+        self.nonzero = {}
+        self.fan_in = {}
+        self.fan_out = {}
+        self.macs = {}
+
+    def add(self, layer, inputs, fan_out, macs=None):
+        inputs = np.asarray(inputs)
+        counts = np.count_nonzero(inputs, axis=1)
+        self.nonzero.setdefault(layer, []).append(counts)
+        self.fan_in[layer] = inputs.shape[1]
+        self.fan_out[layer] = fan_out
+        if macs is not None:
+            self.macs[layer] = self.macs.get(layer, 0) + macs
+
+    def layer_nonzero(self, layer):
+        """(samples,) nonzero input counts of one layer, over every batch added."""
+        parts = self.nonzero.get(layer, [])
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def zero_fraction(self, layer):
+        """(samples,) fraction of layer inputs that are exactly zero, per sample."""
+        return 1 - self.layer_nonzero(layer) / self.fan_in[layer]
+
+    def dense_macs(self, layer):
+        return len(self.layer_nonzero(layer)) * self.fan_in[layer] * self.fan_out[layer]
+
+    def sparse_macs(self, layer):
+        return int(self.layer_nonzero(layer).sum()) * self.fan_out[layer]
+
+    def cycles(self, layer, lanes=None, mac_cycles=1):
+        """(dense, zero-skipping) cycles of layer over all samples, see the model above."""
+        lanes = self.fan_in[layer] if lanes is None else lanes
+        nonzero = self.layer_nonzero(layer)
+        dense = len(nonzero) * -(-self.fan_in[layer] // lanes) * mac_cycles
+        sparse = int((-(-nonzero // lanes)).sum()) * mac_cycles
+        return dense, sparse
+
+    def summary(self, mac_cycles=1, lanes=REPORT_LANES):
+        """Report lines: zero fractions and MACs per layer, then cycle savings per lanes setting."""
+        lines = []
+        layers = sorted(self.nonzero)
+        for l in layers:
+            zeros = self.zero_fraction(l)
+            performed = self.macs.get(l, self.sparse_macs(l))
+            dense = self.dense_macs(l)
+            lines.append(f"layer {l + 1} ({self.fan_in[l]}->{self.fan_out[l]}): zero inputs "
+                         f"mean {zeros.mean() * 100:.1f}% (min {zeros.min() * 100:.1f}%, max {zeros.max() * 100:.1f}%) "
+                         f"over {len(zeros)} samples; MACs {performed} of {dense} "
+                         f"({(1 - performed / dense) * 100 if dense else 0:.1f}% skipped)")
+        for lane in lanes:
+            dense = sparse = 0
+            for l in layers:
+                d, s = self.cycles(l, lane, mac_cycles)
+                dense, sparse = dense + d, sparse + s
+            name = "lanes=fan_in" if lane is None else f"lanes={lane}"
+            saved = (1 - sparse / dense) * 100 if dense else 0.0
+            lines.append(f"{name}: {dense} dense cycles, {sparse} zero-skipping "
+                         f"({saved:.1f}% saved, {mac_cycles} cycles per MAC)")
+        return lines
+
+# ---------- ZERO-SKIPPING EXECUTION ----------
+def zero_skip_matmul(a, weights_t, stats=None, layer=0):
+    """
+    a @ weights_t on integers as a zero-skipping array would compute it.
+    The MACs performed are the nonzero inputs of each sample (row of a)
+    times the fan-out; the product itself is one matmul over the input
+    columns that are nonzero in any sample of the batch. Exact, so the
+    result is identical to the dense product. stats, a SparsityStats,
+    records the inputs and the MACs performed.
+    """
+    a = np.asarray(a, dtype=np.int64)
+    weights_t = np.asarray(weights_t, dtype=np.int64)
+    columns = np.flatnonzero(a.any(axis=0))
+    acc = a[:, columns] @ weights_t[columns]
+    if stats is not None:
+        macs = int(np.count_nonzero(a, axis=1).sum()) * weights_t.shape[1]
+        stats.add(layer, a, weights_t.shape[1], macs)
+    return acc
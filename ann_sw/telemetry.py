@@ -0,0 +1,188 @@
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from ann_sw.calibration import int_bits_needed
+from ann_sw.fixed_inference import SHIPPED_A, SHIPPED_B, SHIPPED_IN, SHIPPED_W, fixed_predict
+from ann_sw.inference import ACTIVATIONS
+from ann_sw.mem_decode import load_mem_dataset, load_mem_params
+from ann_sw.model_bundle import default_activations
+
+# ---------- PARAMETERS ----------
+# Requantization telemetry. requantize() in ann_sw.fixed_inference rounds
+# every layer's sums to Q(N_A, X_A) and clamps them without a trace.
+# A QuantTelemetry passed as trace= to fixed_forward()/fixed_predict()
+# reads the "shifted" tap (rounded, not yet saturated) of every batch and
+# keeps, per layer and neuron,
+#   - positive and negative saturation hits,
+#   - the largest magnitude seen, against the 2^(X_A-1) range,
+#   - with a float reference, the error of the unsaturated activations
+#     against the float model on the same samples (mean and max, in LSBs
+#     of the activation format). The fixed path feeds its own outputs
+#     forward, so this is the rounding error accumulated up to that layer.
+# Everything is summed over whole (samples, neurons) arrays; nothing is
+# kept per sample.
+TOP_NEURONS = 3   # neurons listed per layer in the summary
+
+class QuantTelemetry:
+    """
+    Saturation and rounding-error counters of the integer engine.
+
+        telemetry = QuantTelemetry(n_a, x_a, X_float, weights_float, biases_float)
+        fixed_predict(..., trace=telemetry)
+        print("\\n".join(telemetry.summary()))
+        telemetry.save("telemetry.json")
+
+    X_float (all samples, indexed by the trace's row numbers), weights and
+    biases are the float reference; leave them out to count saturation only.
+    """
+
+    def __init__(self, n_a, x_a, X_float=None, weights=None, biases=None, activations=None):
+        self.n_a, self.x_a = n_a, x_a
+        self.lsb = 2.0 ** -(n_a - x_a)
+        self.max_int = (1 << (n_a - 1)) - 1
+        self.min_int = -(1 << (n_a - 1))
+        self.X_float = X_float
+        self.weights = None if weights is None else [np.asarray(w, dtype=np.float64) for w in weights]
+        self.biases = None if biases is None else [np.asarray(b, dtype=np.float64).reshape(-1) for b in biases]
+        if self.weights is not None and activations is None:
+            activations = default_activations(len(self.weights))
+        self.activations = activations
+        self.samples = {}
+        self.pos_hits = {}
+        self.neg_hits = {}
+        self.max_abs = {}
+        self.err_sum = {}
+        self.err_count = {}
+        self.err_max = {}
+        self._reference = (None, None)
+
+    def _float_sums(self, layer, rows):
+        """Float pre-activation sums of every layer for this batch, computed once per batch."""
+        key, sums = self._reference
+        if key is None or not np.array_equal(key, rows):
+            x = np.asarray(self.X_float[rows], dtype=np.float64)
+            sums = []
+            for l, (w, b) in enumerate(zip(self.weights, self.biases)):
+                x = x @ w.T + b
+                sums.append(x)
+                if l < len(self.weights) - 1:
+                    x = ACTIVATIONS[self.activations[l]](x)
+            self._reference = (rows.copy(), sums)
+        return sums[layer]
+
+    def __call__(self, layer, point, values, rows):
+        if point != "shifted":
+            return
+        if layer not in self.samples:
+            neurons = values.shape[1]
+            self.samples[layer] = 0
+            for counter in (self.pos_hits, self.neg_hits, self.max_abs, self.err_count):
+                counter[layer] = np.zeros(neurons, dtype=np.int64)
+            self.err_sum[layer] = np.zeros(neurons)
+            self.err_max[layer] = np.zeros(neurons)
+        values = np.asarray(values, dtype=np.int64)
+        high = values > self.max_int
+        low = values < self.min_int
+        self.samples[layer] += len(values)
+        self.pos_hits[layer] += high.sum(axis=0)
+        self.neg_hits[layer] += low.sum(axis=0)
+        if len(values):
+            self.max_abs[layer] = np.maximum(self.max_abs[layer], np.abs(values).max(axis=0))
+        if self.weights is not None:
+            inside = ~(high | low)
+            error = np.abs(values * self.lsb - self._float_sums(layer, rows)) / self.lsb
+            error = np.where(inside, error, 0.0)
+            self.err_sum[layer] += error.sum(axis=0)
+            self.err_count[layer] += inside.sum(axis=0)
+            if len(values):
+                self.err_max[layer] = np.maximum(self.err_max[layer], error.max(axis=0))
+
+    def to_dict(self):
+        """JSON-serializable counters: format, then per layer totals and per-neuron lists."""
+        layers = []
+        for l in sorted(self.samples):
+            hits = self.pos_hits[l] + self.neg_hits[l]
+            entry = {"layer": l + 1, "samples": self.samples[l], "neurons": len(hits),
+                     "positive_hits": self.pos_hits[l].tolist(), "negative_hits": self.neg_hits[l].tolist(),
+                     "saturation_rate": float(hits.sum()) / max(1, self.samples[l] * len(hits)),
+                     "max_abs": (self.max_abs[l] * self.lsb).tolist(),
+                     "max_abs_layer": float(self.max_abs[l].max(initial=0) * self.lsb),
+                     "range": 2.0 ** (self.x_a - 1),
+                     "headroom_bits": self.x_a - int(int_bits_needed(self.max_abs[l].max(initial=0) * self.lsb))}
+            if self.weights is not None:
+                count = self.err_count[l]
+                entry["error_mean_lsb"] = (self.err_sum[l] / np.maximum(count, 1)).tolist()
+                entry["error_max_lsb"] = self.err_max[l].tolist()
+                entry["error_mean_lsb_layer"] = float(self.err_sum[l].sum()) / max(1, int(count.sum()))
+                entry["error_max_lsb_layer"] = float(self.err_max[l].max(initial=0))
+            layers.append(entry)
+        return {"n_a": self.n_a, "x_a": self.x_a, "layers": layers}
+
+    def save(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+            f.write("\n")
+        return filename
+
+    def summary(self):
+        """Compact table, one row per layer, then the most saturated neurons."""
+        data = self.to_dict()
+        has_error = self.weights is not None
+        lines = [f"Q({self.n_a},{self.x_a}) activations, range +-{2.0 ** (self.x_a - 1):g}",
+                 f"{'layer':>5} {'neurons':>7} {'+sat':>9} {'-sat':>9} {'sat %':>8} {'max |a|':>10} {'headroom':>8}"
+                 + (f" {'err mean':>9} {'err max':>9}" if has_error else "")]
+        for e in data["layers"]:
+            line = (f"{e['layer']:5d} {e['neurons']:7d} {sum(e['positive_hits']):9d} {sum(e['negative_hits']):9d} "
+                    f"{e['saturation_rate'] * 100:8.3f} {e['max_abs_layer']:10.4g} {e['headroom_bits']:+8d}")
+            if has_error:
+                line += f" {e['error_mean_lsb_layer']:9.3f} {e['error_max_lsb_layer']:9.3f}"
+            lines.append(line)
+        if has_error:
+            lines.append("errors in LSBs of the activation format, unsaturated values vs the float model")
+        for e in data["layers"]:
+            hits = np.array(e["positive_hits"]) + np.array(e["negative_hits"])
+            worst = [int(n) for n in np.argsort(-hits, kind="stable")[:TOP_NEURONS] if hits[n]]
+            if worst:
+                lines.append(f"layer {e['layer']} most saturated neurons: "
+                             + ", ".join(f"{n} (+{e['positive_hits'][n]}/-{e['negative_hits'][n]})" for n in worst))
+        return lines
+
+# ---------- COMMAND LINE ----------
+# python -m ann_sw.telemetry [block_temp_inference] [N_A X_A] [--json telemetry.json]
+# Runs the shipped block_temp_inference export (formats as in fixed_inference.check)
+# with Q(N_A, X_A) activations and prints the telemetry table.
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    json_file = None
+    if "--json" in args:
+        i = args.index("--json")
+        json_file = args[i + 1]
+        del args[i:i + 2]
+    if len(args) not in (0, 1, 2, 3):
+        print("Usage: python -m ann_sw.telemetry [DIR] [N_A X_A] [--json FILE]")
+        sys.exit(1)
+    directory = Path(args[0]) if len(args) in (1, 3) else Path(__file__).resolve().parent.parent / "block_temp_inference"
+    n_a, x_a = (int(args[-2]), int(args[-1])) if len(args) >= 2 else SHIPPED_A
+    X_fixed, X_float, y = load_mem_dataset(directory / "test_88.mem", *SHIPPED_IN, num_features=64, fmt="bin")
+    weights, biases, weights_float, biases_float = [], [], [], []
+    for k, (wq, bq) in enumerate(zip(SHIPPED_W, SHIPPED_B), start=1):
+        w_fixed, w_float = load_mem_params(directory / f"layer{k}_weights.mem", *wq, fmt="bin")
+        b_fixed, b_float = load_mem_params(directory / f"layer{k}_biases.mem", *bq, num_fields=1, fmt="bin")
+        weights.append(w_fixed)
+        biases.append(b_fixed[:, 0])
+        weights_float.append(w_float)
+        biases_float.append(b_float[:, 0])
+    f_a = n_a - x_a
+    telemetry = QuantTelemetry(n_a, x_a, X_float, weights_float, biases_float)
+    _, _, accuracy = fixed_predict(X_fixed, weights, biases, SHIPPED_IN[0] - SHIPPED_IN[1],
+                                   [f_a + n - x for n, x in SHIPPED_W], [n - x for n, x in SHIPPED_B],
+                                   n_a, x_a, y=y, trace=telemetry)
+    print(f"accuracy {accuracy:.2f}%")
+    for line in telemetry.summary():
+        print(line)
+    if json_file is not None:
+        telemetry.save(json_file)
+        print(f"Saved telemetry to {json_file}")
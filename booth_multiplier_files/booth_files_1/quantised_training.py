@@ -1,4 +1,6 @@
-import numpy as np
+import sys
+from pathlib import Path
+
 import tensorflow as tf
 from tensorflow.keras import layers, regularizers # type: ignore
 from tensorflow.keras.models import Sequential # type: ignore
@@ -6,6 +8,10 @@ from tensorflow.keras.utils import to_categorical # type: ignore
 from tensorflow.keras.optimizers import Adam # type: ignore
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+from ann_sw.mem_cache import cached_load_mem_dataset
+from ann_sw.mem_encode import write_mem_params
+
 # ---------- PARAMETERS ----------
 input_dim = 64
 hidden_dim1 = 50
@@ -19,6 +25,9 @@ output_dim = 10
 # N_A, X_A: total bits, integer bits for activations (layer outputs)
 N_W, X_W = 16, 8   # Q8.8 for weights
 N_B, X_B = 32, 16  # Q16.16 for biases (adjust if your hardware bias width is different)
+
+# MEM_FORMAT: "bin" for $readmemb, "hex" for $readmemh .mem files (read and written)
+MEM_FORMAT = "bin"
 N_A, X_A = 16, 8   # Q8.8 for activations (output of hidden layers)
 
 # ---------- FIXED-POINT HELPERS (TensorFlow compatible for Straight-Through Estimator) ----------
@@ -116,42 +125,14 @@ class QuantizedDense(layers.Layer):
         return output
 
 # ---------- LOAD TRAINING DATA ----------
-X_train_raw = []
-y_train_raw = []
-
 # Assuming train_88.mem contains pixel data quantized to a specific format
 # Based on your input_88.py, pixel data was described as n_bits=32, int_bits=16 (Q16.16)
 # However, your original script used n_w, x_w = 16, 8 (Q8.8) to parse it from the file.
 # We'll use the Q16.16 (N_IN, X_IN) from input_88.py for parsing the data correctly.
 N_IN_DATA, X_IN_DATA = 16, 8 # Q16.16 as per input_88.py's definition for input pixels
 
-def fixed_bin_to_float_data(bin_str, n, x):
-    """Converts a 2's complement binary string to a floating-point value."""
-    val_int = int(bin_str, 2)
-    # Handle two's complement for negative numbers
-    if val_int >= (1 << (n - 1)):
-        val_int -= (1 << n)
-    return float(val_int) / (2**(n - x))
-
-with open("train_88.mem", "r") as f:
-    for line in f:
-        line = line.strip()
-        pixel_bits = line[:-4] # e.g., 64 pixels * N_IN_DATA bits/pixel
-        label_bits = line[-4:]
-
-        image = []
-        for i in range(input_dim):
-            # Each pixel is N_IN_DATA bits long
-            bin_chunk = pixel_bits[i*N_IN_DATA:(i+1)*N_IN_DATA]
-            float_val = fixed_bin_to_float_data(bin_chunk, N_IN_DATA, X_IN_DATA)
-            image.append(float_val)
-
-        label = int(label_bits, 2)
-        X_train_raw.append(image)
-        y_train_raw.append(label)
-
-X = np.array(X_train_raw, dtype=np.float32)
-y = np.array(y_train_raw, dtype=np.int32)
+# Each line holds input_dim pixels of N_IN_DATA bits followed by a 4-bit label
+_, X, y = cached_load_mem_dataset("train_88.mem", N_IN_DATA, X_IN_DATA, num_features=input_dim, label_bits=4, fmt=MEM_FORMAT)
 y_cat = to_categorical(y, num_classes=output_dim)
 
 print(f"Loaded {len(X)} training samples.")
@@ -186,23 +167,6 @@ plt.tight_layout()
 plt.show()
 
 # ---------- EXPORT QUANTIZED WEIGHTS & BIASES ----------
-# These are the functions to convert float values (which were trained with QAT)
-# to their final fixed-point binary string representation for hardware.
-def float_to_fixed_bin_str(val, n_total, n_integer):
-    n_fractional = n_total - n_integer
-    scaled_val = round(val * (2**n_fractional))
-
-    # Clamp to the actual representable integer range
-    max_representable_int = (2**(n_total - 1)) - 1
-    min_representable_int = -(2**(n_total - 1))
-    clamped_val = int(max(min(scaled_val, max_representable_int), min_representable_int))
-
-    # Convert to two's complement binary string
-    if clamped_val < 0:
-        clamped_val = (1 << n_total) + clamped_val
-    return format(clamped_val, f'0{n_total}b')
-
-
 for layer_idx, layer in enumerate(model.layers):
     if isinstance(layer, QuantizedDense): # Only process our custom quantized layers
         # Get the current float values of the kernel and bias from the trained model
@@ -212,17 +176,8 @@ for layer_idx, layer in enumerate(model.layers):
 
         weights_to_export_T = weights_float.T # Transpose for export: (out_dim, in_dim)
 
-        # Export weights
-        with open(f"layer{layer_idx+1}_weights.mem", "w") as wf:
-            for row in weights_to_export_T:
-                bin_row = ''.join([
-                    float_to_fixed_bin_str(w, N_W, X_W) for w in row
-                ])
-                wf.write(bin_row + "\n")
-
-        # Export biases
-        with open(f"layer{layer_idx+1}_biases.mem", "w") as bf:
-            for b in biases_float:
-                bf.write(float_to_fixed_bin_str(b, N_B, X_B) + "\n")
+        # Export weights and biases, each file quantized and encoded as one array
+        write_mem_params(weights_to_export_T, f"layer{layer_idx+1}_weights.mem", N_W, X_W, MEM_FORMAT)
+        write_mem_params(biases_float, f"layer{layer_idx+1}_biases.mem", N_B, X_B, MEM_FORMAT)
 
 print("\nQuantized weights and biases exported to .mem files.")
\ No newline at end of file
@@ -9,6 +9,10 @@ import matplotlib.pyplot as plt
 from pathlib import Path
 import sys
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ann_sw.mem_cache import cached_load_mem_dataset
+from ann_sw.mem_encode import write_mem_params
+
 # ---------------- CONFIG ----------------
 input_dim = 64
 hidden_dim1 = 50
@@ -28,6 +32,7 @@ N_IN_DATA = 16   # bits per pixel in file
 X_IN_DATA = 8    # integer bits in stored pixel Q-format (Q8.8)
 LABEL_BITS = 4
 TRAIN_MEM_PATH = "train_88.mem"
+MEM_FORMAT = "bin"  # "bin" for $readmemb, "hex" for $readmemh .mem files
 
 # Training params
 LEARNING_RATE = 3e-4
@@ -139,41 +144,11 @@ class FinnQuantDense(layers.Layer):
         return base
 
 # ---------------- Data loader ----------------
-def fixed_bin_to_float(bin_str, total_bits, integer_bits):
-    """Convert two's complement binary string -> float using Q-format."""
-    iv = int(bin_str, 2)
-    if iv >= (1 << (total_bits - 1)):
-        iv -= (1 << total_bits)
-    frac_bits = total_bits - integer_bits
-    return float(iv) / (2 ** frac_bits)
-
 if not Path(TRAIN_MEM_PATH).exists():
     print(f"ERROR: {TRAIN_MEM_PATH} not found. Place it in current folder.", file=sys.stderr)
     sys.exit(1)
 
-X_list = []
-y_list = []
-expected_len = input_dim * N_IN_DATA + LABEL_BITS
-with open(TRAIN_MEM_PATH, "r") as f:
-    for i, line in enumerate(f):
-        s = line.strip()
-        if len(s) < expected_len:
-            raise ValueError(f"Line {i} length {len(s)} < expected {expected_len}")
-
-        pixel_bits = s[: input_dim * N_IN_DATA]
-        label_bits = s[input_dim * N_IN_DATA : input_dim * N_IN_DATA + LABEL_BITS]
-
-        img = []
-        for j in range(input_dim):
-            chunk = pixel_bits[j*N_IN_DATA : (j+1)*N_IN_DATA]
-            fval = fixed_bin_to_float(chunk, N_IN_DATA, X_IN_DATA)
-            img.append(fval)
-        lbl = int(label_bits, 2)
-        X_list.append(img)
-        y_list.append(lbl)
-
-X = np.array(X_list, dtype=np.float32)
-y = np.array(y_list, dtype=np.int32)
+_, X, y = cached_load_mem_dataset(TRAIN_MEM_PATH, N_IN_DATA, X_IN_DATA, num_features=input_dim, label_bits=LABEL_BITS, fmt=MEM_FORMAT)
 print("Loaded data shape:", X.shape, "labels shape:", y.shape)
 print("Label distribution:", np.unique(y, return_counts=True))
 y_cat = to_categorical(y, num_classes=output_dim)
@@ -224,16 +199,6 @@ plt.tight_layout()
 plt.show()
 
 # ---------------- Export quantized weights & biases to Q-formats ----------------
-def float_to_fixed_bin_str(val, total_bits, integer_bits):
-    frac = total_bits - integer_bits
-    scaled = int(np.round(val * (2 ** frac)))
-    max_int = (2 ** (total_bits - 1)) - 1
-    min_int = -(2 ** (total_bits - 1))
-    clamped = int(max(min(scaled, max_int), min_int))
-    if clamped < 0:
-        clamped = (1 << total_bits) + clamped
-    return format(clamped, f'0{total_bits}b')
-
 layer_idx = 0
 for layer in model.layers:
     if isinstance(layer, FinnQuantDense):
@@ -243,13 +208,8 @@ for layer in model.layers:
 
         wfname = f"layer{layer_idx+1}_weights.mem"
         bfname = f"layer{layer_idx+1}_biases.mem"
-        with open(wfname, "w") as wf:
-            for row in W_export:
-                row_bits = ''.join([float_to_fixed_bin_str(float(w), EXPORT_N_W, EXPORT_X_W) for w in row])
-                wf.write(row_bits + "\n")
-        with open(bfname, "w") as bf:
-            for bv in b:
-                bf.write(float_to_fixed_bin_str(float(bv), EXPORT_N_B, EXPORT_X_B) + "\n")
+        write_mem_params(W_export, wfname, EXPORT_N_W, EXPORT_X_W, MEM_FORMAT)
+        write_mem_params(b, bfname, EXPORT_N_B, EXPORT_X_B, MEM_FORMAT)
         print(f"Exported layer {layer_idx+1} -> {wfname}, {bfname}")
         layer_idx += 1
 
@@ -1,3 +1,6 @@
+import sys
+from pathlib import Path
+
 import numpy as np
 import tensorflow as tf
 from tensorflow.keras import layers, regularizers # type: ignore # type: ignore
@@ -6,6 +9,10 @@ from tensorflow.keras.utils import to_categorical # type: ignore
 from tensorflow.keras.optimizers import Adam # type: ignore
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ann_sw.mem_cache import cached_load_mem_dataset
+from ann_sw.mem_encode import write_mem_params
+
 # ---------- PARAMETERS (All entered at the top of the code) ----------
 input_dim = 64
 hidden_dim1 = 50
@@ -22,6 +29,9 @@ N_W, X_W = 32, 16 # Q8.8 for weights (1 sign + 7 integer + 8 fractional)
 # N_B, X_B: total bits, integer bits for biases
 N_B, X_B = 64, 32 # Q16.16 for biases (1 sign + 15 integer + 16 fractional)
 
+# MEM_FORMAT: "bin" for $readmemb, "hex" for $readmemh .mem files (read and written)
+MEM_FORMAT = "bin"
+
 # N_A, X_A: total bits, integer bits for activations (layer outputs, fed to next layer)
 N_A, X_A = 32, 16 # Q8.8 for activations (1 sign + 7 integer + 8 fractional)
 
@@ -136,36 +146,8 @@ class QuantizedDense(layers.Layer):
         return output
 
 # ---------- LOAD TRAINING DATA ----------
-X_train_raw = []
-y_train_raw = []
-
-def fixed_bin_to_float_data(bin_str, n, x):
-    """Converts a 2's complement binary string to a floating-point value."""
-    val_int = int(bin_str, 2)
-    # Handle two's complement for negative numbers
-    if val_int >= (1 << (n - 1)):
-        val_int -= (1 << n)
-    return float(val_int) / (2**(n - x))
-
-with open("train_88.mem", "r") as f:
-    for line in f:
-        line = line.strip()
-        pixel_bits = line[:-4] # e.g., 64 pixels * N_IN_DATA bits/pixel
-        label_bits = line[-4:]
-
-        image = []
-        for i in range(input_dim):
-            # Each pixel is N_IN_DATA bits long
-            bin_chunk = pixel_bits[i*N_IN_DATA:(i+1)*N_IN_DATA]
-            float_val = fixed_bin_to_float_data(bin_chunk, N_IN_DATA, X_IN_DATA)
-            image.append(float_val)
-
-        label = int(label_bits, 2)
-        X_train_raw.append(image)
-        y_train_raw.append(label)
-
-X = np.array(X_train_raw, dtype=np.float32)
-y = np.array(y_train_raw, dtype=np.int32)
+# Each line holds input_dim pixels of N_IN_DATA bits followed by a 4-bit label
+_, X, y = cached_load_mem_dataset("train_88.mem", N_IN_DATA, X_IN_DATA, num_features=input_dim, label_bits=4, fmt=MEM_FORMAT)
 y_cat = to_categorical(y, num_classes=output_dim)
 
 print(f"Loaded {len(X)} training samples.")
@@ -202,23 +184,6 @@ plt.tight_layout()
 plt.show()
 
 # ---------- EXPORT QUANTIZED WEIGHTS & BIASES ----------
-# These are the functions to convert float values (which were trained with QAT)
-# to their final fixed-point binary string representation for hardware.
-def float_to_fixed_bin_str(val, n_total, n_integer):
-    n_fractional = n_total - n_integer
-    scaled_val = round(val * (2**n_fractional))
-
-    # Clamp to the actual representable integer range
-    max_representable_int = (2**(n_total - 1)) - 1
-    min_representable_int = -(2**(n_total - 1))
-    clamped_val = int(max(min(scaled_val, max_representable_int), min_representable_int))
-
-    # Convert to two's complement binary string
-    if clamped_val < 0:
-        clamped_val = (1 << n_total) + clamped_val
-    return format(clamped_val, f'0{n_total}b')
-
-
 for layer_idx, layer in enumerate(model.layers):
     # The first layer is Input, so we skip it or check for QuantizedDense
     if isinstance(layer, QuantizedDense):
@@ -229,26 +194,18 @@ for layer_idx, layer in enumerate(model.layers):
 
         weights_to_export_T = weights_float.T # Transpose for export: (out_dim, in_dim)
 
-        # Export weights
-        with open(f"layer{layer_idx+1}_weights.mem", "w") as wf:
-            for row in weights_to_export_T:
-                # Ensure values are not NaN before converting
-                if np.isnan(row).any():
-                    print(f"Warning: NaN detected in weights for layer {layer_idx+1}. Skipping export for this layer.")
-                    break # Skip this row or layer if NaN is present
-                bin_row = ''.join([
-                    float_to_fixed_bin_str(w, N_W, X_W) for w in row
-                ])
-                wf.write(bin_row + "\n")
-
-        # Export biases
-        with open(f"layer{layer_idx+1}_biases.mem", "w") as bf:
-            # Ensure values are not NaN before converting
-            if np.isnan(biases_float).any():
-                print(f"Warning: NaN detected in biases for layer {layer_idx+1}. Skipping export for this layer.")
-            else:
-                for b in biases_float:
-                    bf.write(float_to_fixed_bin_str(b, N_B, X_B) + "\n")
+        # Export weights. Rows from the first one containing NaN on are skipped.
+        nan_rows = np.flatnonzero(np.isnan(weights_to_export_T).any(axis=1))
+        if len(nan_rows):
+            print(f"Warning: NaN detected in weights for layer {layer_idx+1}. Skipping export for this layer.")
+            weights_to_export_T = weights_to_export_T[:nan_rows[0]]
+        write_mem_params(weights_to_export_T, f"layer{layer_idx+1}_weights.mem", N_W, X_W, MEM_FORMAT)
+
+        # Export biases (an empty file if any bias is NaN)
+        if np.isnan(biases_float).any():
+            print(f"Warning: NaN detected in biases for layer {layer_idx+1}. Skipping export for this layer.")
+            biases_float = biases_float[:0]
+        write_mem_params(biases_float, f"layer{layer_idx+1}_biases.mem", N_B, X_B, MEM_FORMAT)
 
 
 print("\nQuantized weights and biases export attempted.")